@@ -0,0 +1,99 @@
+"""
+SKG Notenbank - Sheet Music Database and Archive Management System
+Copyright (C) 2026 Arno Euteneuer
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from functools import cached_property
+
+from .matching import NEVER_MATCHES, compile_filter_strings, part_name_matches
+from .models import MusicianProfile
+
+
+class AccessContext:
+    """
+    Everything the musician-facing views need to decide what a user may see,
+    derived once per request (see AccessContextMiddleware).
+
+    The profile flags and the instrument groups are loaded lazily with a
+    single query; download-window answers are memoized per piece.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.is_staff = bool(user.is_authenticated and user.is_staff)
+        self._piece_downloadable = {}
+
+    @cached_property
+    def _profile_rows(self):
+        if not self.user.is_authenticated:
+            return []
+        return list(
+            MusicianProfile.objects.filter(user_id=self.user.pk).values_list(
+                "pk",
+                "has_full_archive_access",
+                "instrument_groups__pk",
+                "instrument_groups__filter_strings",
+            )
+        )
+
+    @property
+    def has_profile(self):
+        return bool(self._profile_rows)
+
+    @property
+    def profile_id(self):
+        return self._profile_rows[0][0] if self._profile_rows else None
+
+    @property
+    def has_full_archive_access(self):
+        """The profile flag only; staff users are handled separately."""
+        return bool(self._profile_rows and self._profile_rows[0][1])
+
+    @property
+    def has_full_access(self):
+        """Staff or full-archive musicians see every part of every piece."""
+        return self.is_staff or self.has_full_archive_access
+
+    @cached_property
+    def group_ids(self):
+        return sorted({row[2] for row in self._profile_rows if row[2] is not None})
+
+    @cached_property
+    def part_matcher(self):
+        filter_strings = sorted(
+            {row[3] for row in self._profile_rows if row[2] is not None}
+        )
+        if not filter_strings:
+            return NEVER_MATCHES
+        return compile_filter_strings(*filter_strings)
+
+    def can_view_part(self, part_name):
+        """Does one of the user's instrument groups match this part name?"""
+        return part_name_matches(self.part_matcher, part_name)
+
+    def is_piece_downloadable(self, piece):
+        """Memoized Piece.is_active_for_download() for this request."""
+        if piece.pk not in self._piece_downloadable:
+            self._piece_downloadable[piece.pk] = piece.is_active_for_download()
+        return self._piece_downloadable[piece.pk]
+
+    def allowed_parts(self, piece, parts):
+        """Filter `parts` of `piece` down to the ones the user may download."""
+        if self.has_full_access:
+            return list(parts)
+        if not self.group_ids or not self.is_piece_downloadable(piece):
+            return []
+        return [part for part in parts if self.can_view_part(part.part_name)]
@@ -16,5 +16,5 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
-from .admin_actions import find_similar_names  # re-export for view workflow
+from .admin_actions import find_similar_names, merge_names  # re-export for view workflow
 from .admin_registrations import *  # noqa: F401,F403
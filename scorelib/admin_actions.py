@@ -17,21 +17,23 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
 import csv
-import io
 import os
-import zipfile
 from difflib import SequenceMatcher
 
 from django.conf import settings
 from django.contrib import admin, messages
 from django.db import models
 from django.forms import Textarea
-from django.http import HttpResponse, HttpResponseRedirect
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import redirect, render
 from django.urls import path
 from django.utils.html import format_html
 
 from .models import AudioRecording, ExternalLink, LoanRecord, Part, Piece, ProgramItem
+from .search_cache import bump_search_version
+from .signals import reindex_pieces
+from .storage import remove_empty_shard_dirs
+from .streaming_zip import iter_zip
 from .utils import get_orphaned_files
 
 
@@ -130,57 +132,43 @@ def get_generic_merge_response(admin_obj, request, queryset, title, action_name)
     )
 
 
-@admin.action(description="Ausgewählte Stücke als ZIP herunterladen")
-def download_parts_as_zip(modeladmin, request, queryset):
-    max_size_mb = 250
-    max_size_bytes = max_size_mb * 1024 * 1024
-
-    total_size = 0
-    for piece in queryset:
+def merge_names(master, merge_ids):
+    """
+    Move the pieces of the composers/arrangers/publishers `merge_ids` to
+    `master` and delete those entries. QuerySet.update() sends no signals,
+    so the search index, the trigrams and the search caches of the moved
+    pieces are refreshed here.
+    """
+    model = type(master)
+    field = model._meta.model_name
+    pieces = Piece.objects.filter(**{f"{field}_id__in": merge_ids})
+    piece_ids = list(pieces.values_list("pk", flat=True))
+    pieces.update(**{field: master})
+    model.objects.filter(pk__in=merge_ids).delete()
+    reindex_pieces(piece_ids)
+    bump_search_version()
+
+
+def _iter_part_files(queryset):
+    for piece in queryset.prefetch_related("parts"):
+        safe_title = "".join(x for x in piece.title if x.isalnum() or x in "._- ")
         for part in piece.parts.all():
             if part.pdf_file:
-                try:
-                    total_size += part.pdf_file.size
-                except (FileNotFoundError, AttributeError):
-                    continue
-
-    if total_size > max_size_bytes:
-        size_actual = total_size / (1024 * 1024)
-        modeladmin.message_user(
-            request,
-            f"Download abgebrochen: Die Dateien sind insgesamt {size_actual:.1f} MB groß (Limit: {max_size_mb} MB). "
-            "Bitte wählen Sie weniger Stücke aus.",
-            level=messages.ERROR,
-        )
-        return HttpResponseRedirect(request.get_full_path())
-
-    buffer = io.BytesIO()
-    try:
-        with zipfile.ZipFile(buffer, "w") as zip_file:
-            for piece in queryset:
-                for part in piece.parts.all():
-                    if part.pdf_file:
-                        file_path = part.pdf_file.path
-                        safe_title = "".join(
-                            x for x in piece.title if x.isalnum() or x in "._- "
-                        )
-                        safe_part = "".join(
-                            x for x in part.part_name if x.isalnum() or x in "._- "
-                        )
-                        filename = f"{safe_title}_{safe_part}.pdf"
-                        arcname = f"{safe_title}/{filename}".replace(" ", "_")
-                        try:
-                            zip_file.write(file_path, arcname)
-                        except FileNotFoundError:
-                            continue
-    except Exception as e:
-        modeladmin.message_user(
-            request, f"Fehler beim Erstellen der ZIP: {e}", level="ERROR"
-        )
-        return HttpResponseRedirect(request.get_full_path())
+                safe_part = "".join(
+                    x for x in part.part_name if x.isalnum() or x in "._- "
+                )
+                filename = f"{safe_title}_{safe_part}.pdf"
+                arcname = f"{safe_title}/{filename}".replace(" ", "_")
+                yield part.pdf_file.path, arcname
+
 
-    buffer.seek(0)
-    response = HttpResponse(buffer.read(), content_type="application/zip")
+@admin.action(description="Ausgewählte Stücke als ZIP herunterladen")
+def download_parts_as_zip(modeladmin, request, queryset):
+    # The archive is written while it is sent, so there is no size limit and
+    # memory use stays constant regardless of how many pieces are selected.
+    response = StreamingHttpResponse(
+        iter_zip(_iter_part_files(queryset)), content_type="application/zip"
+    )
     response["Content-Disposition"] = 'attachment; filename="noten_export.zip"'
     return response
 
@@ -306,5 +294,6 @@ class MediaCleanupMixin:
             full_path = os.path.join(settings.MEDIA_ROOT, file_path)
             if os.path.exists(full_path):
                 os.remove(full_path)
+                remove_empty_shard_dirs(full_path)
                 messages.success(request, f"Datei gelöscht: {file_path}")
         return redirect("admin:cleanup_orphans")
@@ -36,6 +36,8 @@ from ..models import (
     InstrumentGroup,
 )
 from ..forms import PartSplitFormSet
+from ..part_search import part_name_filter, search_parts
+from ..search_backends import search_pieces
 from ..utils import process_pdf_split
 from ..views import piece_csv_import
 
@@ -45,6 +47,7 @@ from ..admin_actions import (
     download_parts_as_zip,
     export_pieces_csv,
     get_generic_merge_response,
+    merge_names,
     MediaCleanupMixin,
 )
 
@@ -127,6 +130,8 @@ class PieceAdmin(MediaCleanupMixin, admin.ModelAdmin):
         "publisher",
         "is_owned_by_orchestra",
     )
+    # only shows the search box; the search itself goes through the
+    # configured search backend, see get_search_results()
     search_fields = (
         "title",
         "archive_label",
@@ -143,6 +148,11 @@ class PieceAdmin(MediaCleanupMixin, admin.ModelAdmin):
         js = ("admin/js/jquery.init.js", "js/admin_filter_collapse.js")
         css = {"all": ("css/admin_custom.css",)}
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return search_pieces(queryset, search_term), False
+
     def get_status_display(self, obj):
         return obj.current_status["label"]
 
@@ -263,6 +273,40 @@ class PartAdmin(admin.ModelAdmin):
     search_fields = ("piece__title", "part_name")
     autocomplete_fields = ("piece",)
 
+    def get_search_results(self, request, queryset, search_term):
+        # wildcard terms ("Tuba*") match part names like the instrument group filters
+        if any(c in search_term for c in "*?["):
+            return queryset.filter(part_name_filter(search_term)), False
+        return super().get_search_results(request, queryset, search_term)
+
+    def get_urls(self):
+        urls = super().get_urls()
+        custom_urls = [
+            path(
+                "search-by-name/",
+                self.admin_site.admin_view(self.part_name_search_view),
+                name="part-name-search",
+            ),
+        ]
+        return custom_urls + urls
+
+    def part_name_search_view(self, request):
+        query = request.GET.get("q", "")
+        page_obj = None
+        if query.strip():
+            page_obj = search_parts(query, request.GET.get("page"))
+
+        context = {
+            **self.admin_site.each_context(request),
+            "title": "Stimmensuche im ganzen Archiv",
+            "query": query,
+            "page_obj": page_obj,
+            "grouped_parts": page_obj.results if page_obj else [],
+            "instrument_groups": InstrumentGroup.objects.order_by("name"),
+            "opts": self.model._meta,
+        }
+        return render(request, "admin/part_name_search.html", context)
+
 
 @admin.register(ExternalLink)
 class ExternalLinkAdmin(admin.ModelAdmin):
@@ -281,9 +325,8 @@ class ComposerAdmin(admin.ModelAdmin):
         if "apply" in request.POST:
             master_id = request.POST.get("master_id")
             master = get_object_or_404(Composer, pk=master_id)
-            others = queryset.exclude(pk=master.pk)
-            Piece.objects.filter(composer__in=others).update(composer=master)
-            others.delete()
+            merge_ids = queryset.exclude(pk=master.pk).values_list("pk", flat=True)
+            merge_names(master, list(merge_ids))
             self.message_user(
                 request, f"Erfolgreich in {master.name} zusammengeführt."
             )
@@ -311,9 +354,8 @@ class ArrangerAdmin(admin.ModelAdmin):
         if "apply" in request.POST:
             master_id = request.POST.get("master_id")
             master = get_object_or_404(Arranger, pk=master_id)
-            others = queryset.exclude(pk=master.pk)
-            Piece.objects.filter(arranger__in=others).update(arranger=master)
-            others.delete()
+            merge_ids = queryset.exclude(pk=master.pk).values_list("pk", flat=True)
+            merge_names(master, list(merge_ids))
             self.message_user(
                 request, f"Erfolgreich in {master.name} zusammengeführt."
             )
@@ -341,9 +383,8 @@ class PublisherAdmin(admin.ModelAdmin):
         if "apply" in request.POST:
             master_id = request.POST.get("master_id")
             master = get_object_or_404(Publisher, pk=master_id)
-            others = queryset.exclude(pk=master.pk)
-            Piece.objects.filter(publisher__in=others).update(publisher=master)
-            others.delete()
+            merge_ids = queryset.exclude(pk=master.pk).values_list("pk", flat=True)
+            merge_names(master, list(merge_ids))
             self.message_user(
                 request, f"Erfolgreich in {master.name} zusammengeführt."
             )
@@ -382,13 +423,9 @@ class InstrumentGroupAdmin(admin.ModelAdmin):
         return custom_urls + urls
 
     def unmatched_parts_view(self, request):
-        all_parts = Part.objects.select_related("piece").all()
-        all_groups = InstrumentGroup.objects.all()
-
-        unmatched = []
-        for part in all_parts:
-            if not any(group.matches_part(part.part_name) for group in all_groups):
-                unmatched.append(part)
+        unmatched = Part.objects.select_related("piece").filter(
+            group_matches__isnull=True
+        )
 
         context = {
             **self.admin_site.each_context(request),
@@ -0,0 +1,214 @@
+"""
+SKG Notenbank - Sheet Music Database and Archive Management System
+Copyright (C) 2026 Arno Euteneuer
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+
+from .models import Part
+from .streaming_zip import iter_zip
+from .utils import write_concert_folder_pdf
+
+
+def get_cache_dir(kind):
+    """Directory for pre-built artifacts of `kind`, created on demand."""
+    base = getattr(settings, "SCORELIB_CACHE_DIR", None) or os.path.join(
+        settings.MEDIA_ROOT, "cache"
+    )
+    path = os.path.join(base, kind)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def safe_filename(value):
+    return "".join(x for x in value if x.isalnum() or x in "._- ").replace(" ", "_")
+
+
+def content_key(entries, *extra):
+    """
+    Digest over the files that go into an artifact (path, name in the
+    artifact, mtime, size) plus any `extra` strings that end up in it. Any
+    change to the program, the parts or the visible groups changes the
+    entries and therefore the key, so a cached artifact is never stale and
+    no invalidation has to be sent to the other worker processes.
+    """
+    digest = hashlib.sha256()
+    for value in extra:
+        digest.update(f"{value}\n".encode())
+    for file_path, name in entries:
+        try:
+            stat = os.stat(file_path)
+        except FileNotFoundError:
+            continue
+        digest.update(
+            f"{name}\0{file_path}\0{stat.st_mtime_ns}\0{stat.st_size}\n".encode()
+        )
+    return digest.hexdigest()[:32]
+
+
+def write_cached_file(path, write):
+    """
+    Create `path` atomically: `write` is called with a temporary file in the
+    same directory, which is renamed once it is complete.
+    """
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def prune_cached_files(directory, prefix, keep):
+    """Remove older artifacts sharing `prefix`, except the file `keep`."""
+    for name in os.listdir(directory):
+        if name.startswith(prefix) and name != keep:
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+
+
+def concert_bundle_entries(concert, access):
+    """
+    (file_path, arcname) pairs of all parts the user may download for
+    `concert`, in program order. Mirrors the parts listed on the concert page.
+    """
+    if not access.has_profile or not access.group_ids:
+        return []
+
+    parts_by_piece = {}
+    for part in (
+        Part.objects.visible_to(access.group_ids)
+        .filter(piece__programitem__concert=concert)
+        .order_by("part_name")
+    ):
+        parts_by_piece.setdefault(part.piece_id, []).append(part)
+
+    entries = []
+    seen = set()
+    for position, item in enumerate(
+        concert.programitem_set.select_related("piece"), start=1
+    ):
+        piece = item.piece
+        if piece.pk in seen:
+            continue
+        seen.add(piece.pk)
+        if not (access.has_full_archive_access or access.is_piece_downloadable(piece)):
+            continue
+
+        folder = f"{position:02d}_{safe_filename(piece.title)}"
+        for part in parts_by_piece.get(piece.pk, []):
+            if part.pdf_file:
+                entries.append(
+                    (part.pdf_file.path, f"{folder}/{safe_filename(part.part_name)}.pdf")
+                )
+    return entries
+
+
+def get_concert_bundle(concert, access):
+    """
+    Path to the ZIP with all of the user's parts for `concert`, or None if
+    there are none.
+
+    Bundles are built once per concert and instrument-group set and shared by
+    every musician of that section; a newer bundle replaces the older ones.
+    """
+    entries = concert_bundle_entries(concert, access)
+    if not entries:
+        return None
+
+    group_set = f"{access.has_full_archive_access}:{access.group_ids}"
+    group_key = hashlib.sha256(group_set.encode()).hexdigest()[:12]
+    prefix = f"concert-{concert.pk}-{group_key}-"
+    filename = f"{prefix}{content_key(entries)}.zip"
+
+    directory = get_cache_dir("bundles")
+    path = os.path.join(directory, filename)
+    if not os.path.exists(path):
+        write_cached_file(path, lambda f: f.writelines(iter_zip(entries)))
+        prune_cached_files(directory, prefix, filename)
+    return path
+
+
+def concert_folder_program(concert, group, include_closed=False):
+    """
+    (piece, [part, ...]) in program order with the parts matching `group`.
+    Pieces whose download window is closed are left out unless
+    `include_closed` is set.
+    """
+    parts_by_piece = {}
+    for part in (
+        Part.objects.filter(
+            group_matches__group=group, piece__programitem__concert=concert
+        )
+        .distinct()
+        .order_by("part_name")
+    ):
+        if part.pdf_file:
+            parts_by_piece.setdefault(part.piece_id, []).append(part)
+
+    program = []
+    seen = set()
+    for item in concert.programitem_set.select_related("piece__composer"):
+        piece = item.piece
+        if piece.pk in seen:
+            continue
+        seen.add(piece.pk)
+        if not include_closed and not piece.is_active_for_download():
+            continue
+        if piece.pk in parts_by_piece:
+            program.append((piece, parts_by_piece[piece.pk]))
+    return program
+
+
+def get_concert_folder_pdf(concert, group, include_closed=False):
+    """
+    Path to the merged PDF of all parts of `group` for `concert`, or None if
+    there are none. Rebuilt only when an input part, the program order or
+    a title that ends up in bookmarks or metadata changes.
+    """
+    program = concert_folder_program(concert, group, include_closed)
+    if not program:
+        return None
+
+    entries = [
+        (part.pdf_file.path, f"{position}/{piece.title}/{part.part_name}")
+        for position, (piece, parts) in enumerate(program, start=1)
+        for part in parts
+    ]
+    composers = [piece.composer.name for piece, _ in program if piece.composer]
+    key = content_key(entries, concert.title, group.name, *composers)
+
+    prefix = f"concert-{concert.pk}-group-{group.pk}-{int(include_closed)}-"
+    filename = f"{prefix}{key}.pdf"
+
+    directory = get_cache_dir("folders")
+    path = os.path.join(directory, filename)
+    if not os.path.exists(path):
+        write_cached_file(
+            path, lambda f: write_concert_folder_pdf(f, concert, group, program)
+        )
+        prune_cached_files(directory, prefix, filename)
+    return path
@@ -0,0 +1,248 @@
+"""
+SKG Notenbank - Sheet Music Database and Archive Management System
+Copyright (C) 2026 Arno Euteneuer
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import secrets
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+RANGE_CHUNK_SIZE = 64 * 1024
+# more ranges than this in one request are answered with the full file
+MAX_RANGES = 16
+
+
+def get_accel_redirect_path(file_path):
+    """
+    Internal nginx URI for `file_path` if X-Accel-Redirect offloading is
+    enabled (SCORELIB_X_ACCEL_REDIRECT) and the file lives below MEDIA_ROOT,
+    otherwise None.
+    """
+    if not getattr(settings, "SCORELIB_X_ACCEL_REDIRECT", False):
+        return None
+
+    media_root = os.path.realpath(settings.MEDIA_ROOT)
+    real_path = os.path.realpath(file_path)
+    if os.path.commonpath([media_root, real_path]) != media_root:
+        return None
+
+    prefix = getattr(settings, "SCORELIB_X_ACCEL_PREFIX", "/protected-media/")
+    rel_path = os.path.relpath(real_path, media_root).replace(os.sep, "/")
+    return prefix.rstrip("/") + "/" + quote(rel_path)
+
+
+def file_etag(stat):
+    """
+    Strong ETag from modification time and size, in the format nginx uses for
+    static files so that both serving paths hand out the same validator.
+    """
+    return f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+
+
+def parse_range_header(header, size):
+    """
+    Parse a `Range: bytes=...` header for a file of `size` bytes.
+
+    Returns a sorted list of merged, inclusive (start, end) tuples, an empty
+    list if none of the ranges is satisfiable, or None if the header is
+    missing or malformed and should be ignored.
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec.strip():
+        return None
+
+    ranges = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        first, sep, last = item.partition("-")
+        if not sep:
+            return None
+        first, last = first.strip(), last.strip()
+        try:
+            if not first:
+                # suffix range: the last N bytes
+                suffix = int(last)
+                # nothing of an empty file is satisfiable
+                if suffix <= 0 or not size:
+                    continue
+                ranges.append((max(size - suffix, 0), size - 1))
+                continue
+            start = int(first)
+            end = int(last) if last else None
+        except ValueError:
+            return None
+        if start < 0 or (end is not None and end < start):
+            return None
+        if start < size:
+            ranges.append((start, size - 1 if end is None else min(end, size - 1)))
+
+    if len(ranges) > MAX_RANGES:
+        return None
+
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(end, merged[-1][1]))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def if_range_matches(request, etag, last_modified):
+    """
+    Evaluate If-Range: ranges may only be served if the client's validator
+    still describes the current file (strong ETag or exact Last-Modified).
+    """
+    if_range = request.headers.get("If-Range")
+    if not if_range:
+        return True
+    if if_range.startswith(("\"", "W/")):
+        return etag is not None and if_range == etag
+    date = parse_http_date_safe(if_range)
+    return date is not None and date == int(last_modified)
+
+
+def _read_range(filelike, start, length):
+    filelike.seek(start)
+    while length > 0:
+        chunk = filelike.read(min(RANGE_CHUNK_SIZE, length))
+        if not chunk:
+            break
+        length -= len(chunk)
+        yield chunk
+
+
+def _single_range_response(file_path, content_type, start, end, size):
+    def body():
+        with open(file_path, "rb") as f:
+            yield from _read_range(f, start, end - start + 1)
+
+    response = StreamingHttpResponse(body(), status=206, content_type=content_type)
+    response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    response["Content-Length"] = end - start + 1
+    return response
+
+
+def _multi_range_response(file_path, content_type, ranges, size):
+    boundary = secrets.token_hex(16)
+    heads = [
+        (
+            f"--{boundary}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n"
+        ).encode("ascii")
+        for start, end in ranges
+    ]
+    tail = f"--{boundary}--\r\n".encode("ascii")
+
+    def body():
+        with open(file_path, "rb") as f:
+            for head, (start, end) in zip(heads, ranges):
+                yield head
+                yield from _read_range(f, start, end - start + 1)
+                yield b"\r\n"
+        yield tail
+
+    response = StreamingHttpResponse(
+        body(),
+        status=206,
+        content_type=f"multipart/byteranges; boundary={boundary}",
+    )
+    response["Content-Length"] = (
+        sum(len(head) + end - start + 1 + 2 for head, (start, end) in zip(heads, ranges))
+        + len(tail)
+    )
+    return response
+
+
+def _file_response(request, file_path, content_type, stat, etag):
+    size = stat.st_size
+
+    ranges = None
+    if request.method in ("GET", "HEAD") and if_range_matches(
+        request, etag, stat.st_mtime
+    ):
+        ranges = parse_range_header(request.headers.get("Range"), size)
+
+    if ranges == []:
+        response = HttpResponse(status=416, content_type=content_type)
+        response["Content-Range"] = f"bytes */{size}"
+    elif ranges and len(ranges) == 1:
+        start, end = ranges[0]
+        response = _single_range_response(file_path, content_type, start, end, size)
+    elif ranges:
+        response = _multi_range_response(file_path, content_type, ranges, size)
+    else:
+        response = FileResponse(open(file_path, "rb"), content_type=content_type)
+
+    response["Accept-Ranges"] = "bytes"
+    return response
+
+
+def serve_protected_file(
+    request, file_path, content_type, filename=None, etag=None, attachment=False
+):
+    """
+    Send a file after the caller has done its permission checks.
+
+    Conditional requests (If-None-Match / If-Modified-Since) are answered
+    with 304 before any file is opened. `etag` may be a stored content hash;
+    by default it is derived from mtime and size. Files handed to nginx
+    always use the mtime/size ETag, because nginx replaces the upstream
+    ETag with its own and clients revalidate with that. Responses are marked
+    private so that only the musician's own browser keeps a copy, and must
+    be revalidated because download permissions can change.
+
+    With X-Accel-Redirect enabled Django only answers with the internal
+    location and nginx streams the file (including Range requests), so no
+    gunicorn worker is blocked for the duration of the transfer. Otherwise
+    the file is streamed from Python, with support for single and multiple
+    byte ranges so that audio players can seek.
+    """
+    if not os.path.exists(file_path):
+        raise Http404
+
+    stat = os.stat(file_path)
+    accel_path = get_accel_redirect_path(file_path)
+    etag = quote_etag(etag) if etag and not accel_path else file_etag(stat)
+    last_modified = int(stat.st_mtime)
+
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        if accel_path:
+            response = HttpResponse(content_type=content_type)
+            response["X-Accel-Redirect"] = accel_path
+        else:
+            response = _file_response(request, file_path, content_type, stat, etag)
+        filename = filename or os.path.basename(file_path)
+        disposition = "attachment" if attachment else "inline"
+        response["Content-Disposition"] = f'{disposition}; filename="{filename}"'
+
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
@@ -0,0 +1,128 @@
+"""
+SKG Notenbank - Sheet Music Database and Archive Management System
+Copyright (C) 2026 Arno Euteneuer
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import hashlib
+import os
+import shutil
+import subprocess
+from datetime import datetime, timedelta, timezone
+
+from pypdf import PdfReader
+
+from .models import AudioRecording, Part
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def pdf_page_count(path):
+    try:
+        return len(PdfReader(path).pages)
+    except Exception:
+        return None
+
+
+def audio_duration(path):
+    """Duration via ffprobe (installed together with ffmpeg), else None."""
+    ffprobe = shutil.which("ffprobe")
+    if not ffprobe:
+        return None
+    try:
+        result = subprocess.run(
+            [
+                ffprobe,
+                "-v", "error",
+                "-show_entries", "format=duration",
+                "-of", "default=noprint_wrappers=1:nokey=1",
+                path,
+            ],
+            capture_output=True,
+            text=True,
+            timeout=60,
+        )
+        return timedelta(seconds=round(float(result.stdout.strip())))
+    except (OSError, ValueError, subprocess.SubprocessError):
+        return None
+
+
+# model -> (file field, measuring function, field for its result)
+FINGERPRINTED = {
+    Part: ("pdf_file", pdf_page_count, "page_count"),
+    AudioRecording: ("audio_file", audio_duration, "duration"),
+}
+
+
+def _stat(instance):
+    file_field, _, _ = FINGERPRINTED[type(instance)]
+    field_file = getattr(instance, file_field)
+    if not field_file:
+        return None, None
+    try:
+        stat = os.stat(field_file.path)
+    except FileNotFoundError:
+        return None, None
+    return field_file.path, stat
+
+
+def is_fingerprint_current(instance):
+    """Do the stored size and mtime still describe the file on disk?"""
+    path, stat = _stat(instance)
+    if stat is None:
+        return instance.file_size is None
+    mtime = datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc)
+    return instance.file_size == stat.st_size and instance.file_mtime == mtime
+
+
+def compute_fingerprint(model, path):
+    """
+    Column values for the file at `path` (or empty values if there is none).
+    Touches no database, so it can run in worker threads.
+    """
+    _, measure, extra_field = FINGERPRINTED[model]
+    if path is None:
+        return {"file_size": None, "file_mtime": None, "sha256": "", extra_field: None}
+    stat = os.stat(path)
+    return {
+        "file_size": stat.st_size,
+        "file_mtime": datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc),
+        "sha256": file_sha256(path),
+        extra_field: measure(path),
+    }
+
+
+def refresh_fingerprint(instance, force=False):
+    """
+    Update the stored fingerprint of a Part or AudioRecording if the file
+    changed (by size/mtime) or `force` is set. Writes with a queryset update,
+    so no save signals are sent. Returns True if something was written.
+    """
+    if not force and is_fingerprint_current(instance):
+        return False
+    path, _ = _stat(instance)
+    values = compute_fingerprint(type(instance), path)
+    type(instance).objects.filter(pk=instance.pk).update(**values)
+    for field, value in values.items():
+        setattr(instance, field, value)
+    return True
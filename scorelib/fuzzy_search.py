@@ -0,0 +1,118 @@
+"""
+SKG Notenbank - Sheet Music Database and Archive Management System
+Copyright (C) 2026 Arno Euteneuer
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import math
+import re
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count
+
+from .matching import normalize_search_text
+from .models import Piece, PieceTrigram
+
+
+def trigrams(text):
+    """
+    Trigrams of every normalized word, padded like pg_trgm does
+    ("bach" -> "  b", " ba", "bac", "ach", "ch ").
+    """
+    result = set()
+    for word in re.findall(r"\w+", normalize_search_text(text or "")):
+        padded = f"  {word} "
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+def piece_trigrams(title_key, *name_keys):
+    """Trigrams indexed for a piece: its title and its people's names."""
+    return trigrams(" ".join(key for key in (title_key, *name_keys) if key))
+
+
+def _wanted_rows(piece_ids=None):
+    rows = Piece.objects.values_list(
+        "pk", "search_key", "composer__search_key", "arranger__search_key"
+    )
+    if piece_ids is not None:
+        rows = rows.filter(pk__in=piece_ids)
+    return {
+        (pk, trigram)
+        for pk, *keys in rows
+        for trigram in piece_trigrams(*keys)
+    }
+
+
+def sync_piece_trigrams(piece_ids):
+    """
+    Recompute the trigram rows of the given pieces. Only the difference is
+    written, so re-saving a piece with an unchanged title costs two reads.
+    """
+    piece_ids = [int(pk) for pk in piece_ids if pk]
+    if not piece_ids:
+        return
+    wanted = _wanted_rows(piece_ids)
+    existing = set(
+        PieceTrigram.objects.filter(piece_id__in=piece_ids).values_list(
+            "piece_id", "trigram"
+        )
+    )
+
+    stale = defaultdict(list)
+    for pk, trigram in existing - wanted:
+        stale[pk].append(trigram)
+
+    with transaction.atomic():
+        for pk, stale_trigrams in stale.items():
+            PieceTrigram.objects.filter(piece_id=pk, trigram__in=stale_trigrams).delete()
+        PieceTrigram.objects.bulk_create(
+            [PieceTrigram(piece_id=pk, trigram=trigram) for pk, trigram in wanted - existing],
+            batch_size=500,
+            ignore_conflicts=True,
+        )
+
+
+def rebuild_all_trigrams():
+    """Throw away and rebuild the complete trigram index. Returns the row count."""
+    rows = _wanted_rows()
+    with transaction.atomic():
+        PieceTrigram.objects.all().delete()
+        PieceTrigram.objects.bulk_create(
+            [PieceTrigram(piece_id=pk, trigram=trigram) for pk, trigram in rows],
+            batch_size=500,
+        )
+    return len(rows)
+
+
+def fuzzy_piece_ids(query, limit=20, min_similarity=0.6):
+    """
+    Ids of the pieces sharing the most trigrams with `query`, best first.
+    A piece needs at least `min_similarity` of the query's trigrams; the
+    counting happens in the database on the trigram index.
+    """
+    query_trigrams = trigrams(query)
+    if not query_trigrams:
+        return []
+    needed = max(2, math.ceil(len(query_trigrams) * min_similarity))
+    rows = (
+        PieceTrigram.objects.filter(trigram__in=query_trigrams)
+        .values("piece_id")
+        .annotate(hits=Count("pk"))
+        .filter(hits__gte=needed)
+        .order_by("-hits", "piece_id")[:limit]
+    )
+    return [row["piece_id"] for row in rows]
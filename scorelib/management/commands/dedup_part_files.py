@@ -0,0 +1,77 @@
+"""
+SKG Notenbank - Sheet Music Database and Archive Management System
+Copyright (C) 2026 Arno Euteneuer
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from scorelib.fingerprints import refresh_fingerprint
+from scorelib.models import Part
+from scorelib.storage import DedupFileSystemStorage, dedup_enabled
+
+
+class Command(BaseCommand):
+    help = (
+        'Convert the existing part PDFs to the content-addressed storage '
+        '(SCORELIB_DEDUP_STORAGE) in place and delete blobs that are no '
+        'longer referenced. Safe to run repeatedly.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--gc-only',
+            action='store_true',
+            help='Only remove unreferenced blobs, do not convert files',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report what garbage collection would delete',
+        )
+
+    def handle(self, *args, **options):
+        if not dedup_enabled():
+            raise CommandError('SCORELIB_DEDUP_STORAGE is not enabled.')
+
+        storage = DedupFileSystemStorage()
+
+        if not options['gc_only'] and not options['dry_run']:
+            converted = freed = missing = 0
+            parts = Part.objects.exclude(pdf_file='').order_by('pk')
+            for part in parts.iterator():
+                if not storage.exists(part.pdf_file.name):
+                    missing += 1
+                    continue
+                freed += storage.dedup_existing(part.pdf_file.name)
+                # the name now shares the blob's inode (and mtime)
+                refresh_fingerprint(part)
+                converted += 1
+
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'✓ {converted} part files checked, {freed / (1024 * 1024):.1f} MB freed'
+                )
+            )
+            if missing:
+                self.stdout.write(self.style.WARNING(f'{missing} part files not found'))
+
+        count, size = storage.collect_garbage(dry_run=options['dry_run'])
+        verb = 'would be deleted' if options['dry_run'] else 'deleted'
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'✓ {count} unreferenced blobs {verb} ({size / (1024 * 1024):.1f} MB)'
+            )
+        )
@@ -0,0 +1,37 @@
+"""
+SKG Notenbank - Sheet Music Database and Archive Management System
+Copyright (C) 2026 Arno Euteneuer
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from django.core.management.base import BaseCommand
+
+from scorelib.models import Piece
+from scorelib.search_cache import bump_search_version
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute Piece.download_open_until (latest concert date + grace period) '
+        'for all pieces. Run this after changing SCORELIB_DOWNLOAD_GRACE_DAYS.'
+    )
+
+    def handle(self, *args, **options):
+        changed = Piece.objects.all().update_download_open_until()
+        # bulk_update sends no signals; cached search results show the old windows
+        bump_search_version()
+        self.stdout.write(
+            self.style.SUCCESS(f'✓ Download windows rebuilt: {changed} pieces changed')
+        )
@@ -0,0 +1,34 @@
+"""
+SKG Notenbank - Sheet Music Database and Archive Management System
+Copyright (C) 2026 Arno Euteneuer
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from django.core.management.base import BaseCommand
+
+from scorelib.search_cache import bump_search_version
+from scorelib.visibility import rebuild_all_matches
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the materialized Part <-> InstrumentGroup match table from scratch'
+
+    def handle(self, *args, **options):
+        count = rebuild_all_matches()
+        # the matches decide which parts live search shows; no signals are sent
+        bump_search_version()
+        self.stdout.write(
+            self.style.SUCCESS(f'✓ Rebuilt part visibility table: {count} matches')
+        )
@@ -0,0 +1,31 @@
+"""
+SKG Notenbank - Sheet Music Database and Archive Management System
+Copyright (C) 2026 Arno Euteneuer
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from django.core.management.base import BaseCommand
+
+from scorelib.fuzzy_search import rebuild_all_trigrams
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the trigram index of the typo-tolerant search from scratch'
+
+    def handle(self, *args, **options):
+        count = rebuild_all_trigrams()
+        self.stdout.write(
+            self.style.SUCCESS(f'✓ Rebuilt trigram index: {count} entries')
+        )
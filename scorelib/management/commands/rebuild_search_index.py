@@ -0,0 +1,37 @@
+"""
+SKG Notenbank - Sheet Music Database and Archive Management System
+Copyright (C) 2026 Arno Euteneuer
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from django.core.management.base import BaseCommand
+
+from scorelib.search_backends import get_search_backend
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the search index of the configured search backend (SQLite FTS5 '
+        'table or PostgreSQL tsvector column) over titles, labels and names. '
+        'Normally kept current by signals; use after bulk imports via SQL.'
+    )
+
+    def handle(self, *args, **options):
+        if get_search_backend().rebuild():
+            self.stdout.write(self.style.SUCCESS('✓ Search index rebuilt'))
+        else:
+            self.stdout.write(
+                self.style.WARNING('No search index on this database; the ORM search is used.')
+            )
@@ -0,0 +1,38 @@
+"""
+SKG Notenbank - Sheet Music Database and Archive Management System
+Copyright (C) 2026 Arno Euteneuer
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from scorelib.search_backends import get_search_backend
+from scorelib.search_index import update_search_keys
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the normalized search keys of pieces, composers, arrangers, '
+        'publishers, genres and concerts (e.g. after changing the normalization) '
+        'and rebuild the search index from them.'
+    )
+
+    def handle(self, *args, **options):
+        changed = update_search_keys(apps.get_model)
+        get_search_backend().rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f'✓ Search keys rebuilt: {changed} rows changed')
+        )
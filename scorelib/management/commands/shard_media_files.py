@@ -0,0 +1,117 @@
+"""
+SKG Notenbank - Sheet Music Database and Archive Management System
+Copyright (C) 2026 Arno Euteneuer
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from scorelib.models import AudioRecording, Part
+from scorelib.search_cache import bump_search_version
+from scorelib.storage import sharded_uploads_enabled
+
+
+class Command(BaseCommand):
+    help = (
+        'Move existing part PDFs and recordings into the hash-prefix directories '
+        'of SCORELIB_SHARDED_UPLOADS and update the database in batches. '
+        'Can be interrupted and simply started again.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Number of files moved per database transaction (default: 200)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only count the files that would be moved',
+        )
+
+    def handle(self, *args, **options):
+        if not sharded_uploads_enabled():
+            raise CommandError('SCORELIB_SHARDED_UPLOADS is not enabled.')
+
+        for model, field_name in ((Part, 'pdf_file'), (AudioRecording, 'audio_file')):
+            self.shard_model(model, field_name, options['batch_size'], options['dry_run'])
+        if not options['dry_run']:
+            # cached live search results carry the old file names
+            bump_search_version()
+
+    def shard_model(self, model, field_name, batch_size, dry_run):
+        field = model._meta.get_field(field_name)
+        storage = field.storage
+        rows = model.objects.exclude(**{field_name: ''}).order_by('pk')
+
+        moved = missing = conflicts = 0
+        last_pk = 0
+        while True:
+            batch = list(
+                rows.filter(pk__gt=last_pk).values_list('pk', field_name)[:batch_size]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1][0]
+
+            updates = []
+            for pk, name in batch:
+                target = field.upload_to.path_for(name)
+                if target == name:
+                    continue
+                source_path = storage.path(name)
+                target_path = storage.path(target)
+
+                if os.path.exists(source_path):
+                    if os.path.exists(target_path) and not os.path.samefile(
+                        source_path, target_path
+                    ):
+                        conflicts += 1
+                        self.stdout.write(
+                            self.style.WARNING(f'Target already exists: {target}')
+                        )
+                        continue
+                    if not dry_run:
+                        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+                        os.replace(source_path, target_path)
+                elif not os.path.exists(target_path):
+                    # neither here nor there; leave the row alone
+                    missing += 1
+                    continue
+                # else: moved by an interrupted earlier run, only the row is left
+
+                updates.append((pk, target))
+
+            if not dry_run:
+                with transaction.atomic():
+                    for pk, target in updates:
+                        model.objects.filter(pk=pk).update(**{field_name: target})
+            moved += len(updates)
+
+        verb = 'would be moved' if dry_run else 'moved'
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'✓ {model._meta.verbose_name_plural}: {moved} files {verb}'
+            )
+        )
+        if missing or conflicts:
+            self.stdout.write(
+                self.style.WARNING(f'{missing} files not found, {conflicts} conflicts')
+            )
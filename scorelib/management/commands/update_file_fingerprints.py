@@ -0,0 +1,80 @@
+"""
+SKG Notenbank - Sheet Music Database and Archive Management System
+Copyright (C) 2026 Arno Euteneuer
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from scorelib.fingerprints import (
+    FINGERPRINTED,
+    compute_fingerprint,
+    is_fingerprint_current,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Fill file size, SHA-256, page count/duration and mtime of all parts and '
+        'audio recordings. Files whose size and mtime are unchanged are skipped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Number of files hashed in parallel (default: number of CPUs)',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Recompute fingerprints even if size and mtime are unchanged',
+        )
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        force = options['force']
+
+        for model, (file_field, _, _) in FINGERPRINTED.items():
+            instances = [
+                instance
+                for instance in model.objects.order_by('pk')
+                if force or not is_fingerprint_current(instance)
+            ]
+
+            def measure(instance):
+                field_file = getattr(instance, file_field)
+                path = field_file.path if field_file else None
+                if path and not os.path.exists(path):
+                    path = None
+                return compute_fingerprint(model, path)
+
+            # hashing runs in threads (mostly waiting for the SD card);
+            # the database is only written from this thread
+            updated = 0
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for instance, values in zip(instances, executor.map(measure, instances)):
+                    model.objects.filter(pk=instance.pk).update(**values)
+                    updated += 1
+
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'✓ {model._meta.verbose_name_plural}: {updated} fingerprints updated'
+                )
+            )
@@ -21,7 +21,9 @@ from django.core.management.base import BaseCommand, CommandError
 from django.core.files.base import ContentFile
 from pypdf import PdfReader, PdfWriter
 
+from scorelib.fingerprints import refresh_fingerprint
 from scorelib.models import Part
+from scorelib.storage import DedupFileSystemStorage, dedup_enabled
 from scorelib.utils import add_pdf_metadata
 
 
@@ -110,9 +112,16 @@ class Command(BaseCommand):
                         writer.write(buffer)
                         buffer.seek(0)
 
-                        # Save the updated PDF, keeping the original filename
-                        with open(pdf_path, 'wb') as f:
+                        # Save the updated PDF, keeping the original filename.
+                        # Write a new file and swap it in: with the dedup
+                        # storage the old file may be shared with other parts.
+                        tmp_path = f'{pdf_path}.tmp'
+                        with open(tmp_path, 'wb') as f:
                             f.write(buffer.read())
+                        os.replace(tmp_path, pdf_path)
+                        if dedup_enabled():
+                            DedupFileSystemStorage().dedup_existing(part.pdf_file.name)
+                        refresh_fingerprint(part)
 
                         self.stdout.write(
                             self.style.SUCCESS(
@@ -0,0 +1,172 @@
+"""
+SKG Notenbank - Sheet Music Database and Archive Management System
+Copyright (C) 2026 Arno Euteneuer
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import fnmatch
+import re
+import unicodedata
+from functools import lru_cache
+
+# Matches nothing; used for groups/profiles without any filter pattern.
+NEVER_MATCHES = re.compile(r"(?!)")
+
+
+def normalize_part_name(part_name):
+    """Normalize a part name the same way the filter patterns are normalized."""
+    return (part_name or "").strip().lower()
+
+
+# letters NFKD does not decompose into base letter + accent
+_SEARCH_TRANSLATION = str.maketrans(
+    {"ø": "o", "ł": "l", "đ": "d", "ð": "d", "æ": "ae", "œ": "oe", "þ": "th", "ı": "i"}
+)
+
+
+def normalize_search_text(value):
+    """
+    Search key for titles and names: casefolded (ß -> ss), accents stripped
+    (Dvořák -> dvorak, März -> marz) and whitespace collapsed.
+    """
+    value = (value or "").casefold().translate(_SEARCH_TRANSLATION)
+    value = "".join(
+        c for c in unicodedata.normalize("NFKD", value) if not unicodedata.combining(c)
+    )
+    return " ".join(value.split())
+
+
+def split_filter_strings(filter_strings):
+    """Split a comma-separated filter string into lowercase wildcard patterns."""
+    if not filter_strings:
+        return []
+    return [f.strip().lower() for f in filter_strings.split(",") if f.strip()]
+
+
+_REGEX_SPECIAL = set(".^$*+?()[]{}|\\")
+# escaped inside [...]; only non-alphanumerics, PostgreSQL rejects e.g. \x
+_SET_SPECIAL = set("\\[]^-&~|")
+
+
+def _char_set(stuff):
+    """
+    Regex for the inside of a [...] wildcard, split into ranges like
+    fnmatch.translate() does. Reversed ranges such as "z-a" are dropped
+    (fnmatch does the same; the databases would reject them). Returns None
+    if the set cannot match anything.
+    """
+    negate = stuff.startswith("!")
+    chunks = []
+    i, k = 0, (2 if negate else 1)
+    while True:
+        k = stuff.find("-", k)
+        if k < 0:
+            break
+        chunks.append(stuff[i:k])
+        i, k = k + 1, k + 3
+    if stuff[i:]:
+        chunks.append(stuff[i:])
+    else:
+        chunks[-1] += "-"
+    for k in range(len(chunks) - 1, 0, -1):
+        if chunks[k - 1][-1] > chunks[k][0]:
+            chunks[k - 1] = chunks[k - 1][:-1] + chunks[k][1:]
+            del chunks[k]
+    if negate:
+        chunks[0] = chunks[0][1:]
+
+    body = "-".join(
+        "".join("\\" + c if c in _SET_SPECIAL else c for c in chunk) for chunk in chunks
+    )
+    if not body:
+        return "." if negate else None
+    return f"[^{body}]" if negate else f"[{body}]"
+
+
+def wildcard_regex(pattern):
+    """
+    Translate one wildcard pattern (*, ?, [seq], [!seq], as understood by
+    fnmatch) into an anchored regular expression that SQLite's REGEXP and
+    PostgreSQL's ~ both accept, for matching patterns in the database.
+    Returns None for patterns that cannot match anything (e.g. "[z-a]").
+    """
+    result = ["^"]
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        i += 1
+        if c == "*":
+            result.append(".*")
+        elif c == "?":
+            result.append(".")
+        elif c == "[":
+            j = i
+            if j < len(pattern) and pattern[j] == "!":
+                j += 1
+            if j < len(pattern) and pattern[j] == "]":
+                j += 1
+            j = pattern.find("]", j)
+            if j == -1:
+                result.append("\\[")
+                continue
+            char_set = _char_set(pattern[i:j])
+            if char_set is None:
+                return None
+            result.append(char_set)
+            i = j + 1
+        else:
+            result.append("\\" + c if c in _REGEX_SPECIAL else c)
+    result.append("$")
+    return "".join(result)
+
+
+def wildcard_prefix(pattern):
+    """The literal text a wildcard pattern starts with ("tuba*" -> "tuba")."""
+    for i, c in enumerate(pattern):
+        if c in "*?[":
+            return pattern[:i]
+    return pattern
+
+
+@lru_cache(maxsize=512)
+def compile_filter_strings(*filter_strings):
+    """
+    Compile one or more comma-separated wildcard lists (as stored in
+    InstrumentGroup.filter_strings) into a single regular expression.
+
+    The result is cached per process and keyed by the pattern text itself,
+    so a changed group simply produces a new cache entry and can never be
+    answered by a stale matcher.
+    """
+    patterns = []
+    for value in filter_strings:
+        for pattern in split_filter_strings(value):
+            if pattern not in patterns:
+                patterns.append(pattern)
+
+    if not patterns:
+        return NEVER_MATCHES
+
+    return re.compile("|".join(f"(?:{fnmatch.translate(p)})" for p in patterns))
+
+
+def part_name_matches(matcher, part_name):
+    """Run a compiled matcher against a (not yet normalized) part name."""
+    return matcher.match(normalize_part_name(part_name)) is not None
+
+
+def clear_matcher_cache():
+    """Drop all compiled matchers (e.g. after instrument groups were edited)."""
+    compile_filter_strings.cache_clear()
@@ -0,0 +1,74 @@
+# Generated by Django 5.2.8 on 2026-10-16 21:10
+
+import fnmatch
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# frozen copies of scorelib.matching.compile_filter_strings and
+# part_name_matches at the time of this migration
+
+NEVER_MATCHES = re.compile(r'(?!)')
+
+
+def split_filter_strings(filter_strings):
+    if not filter_strings:
+        return []
+    return [f.strip().lower() for f in filter_strings.split(',') if f.strip()]
+
+
+def compile_filter_strings(filter_strings):
+    patterns = []
+    for pattern in split_filter_strings(filter_strings):
+        if pattern not in patterns:
+            patterns.append(pattern)
+    if not patterns:
+        return NEVER_MATCHES
+    return re.compile('|'.join(f'(?:{fnmatch.translate(p)})' for p in patterns))
+
+
+def part_name_matches(matcher, part_name):
+    return matcher.match((part_name or '').strip().lower()) is not None
+
+
+def populate_matches(apps, schema_editor):
+    InstrumentGroup = apps.get_model('scorelib', 'InstrumentGroup')
+    Part = apps.get_model('scorelib', 'Part')
+    PartGroupMatch = apps.get_model('scorelib', 'PartGroupMatch')
+
+    groups = [
+        (pk, compile_filter_strings(filter_strings))
+        for pk, filter_strings in InstrumentGroup.objects.values_list('pk', 'filter_strings')
+    ]
+    PartGroupMatch.objects.bulk_create(
+        [
+            PartGroupMatch(part_id=part_pk, group_id=group_pk)
+            for part_pk, part_name in Part.objects.values_list('pk', 'part_name')
+            for group_pk, matcher in groups
+            if part_name_matches(matcher, part_name)
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scorelib', '0017_concert_sort_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PartGroupMatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='part_matches', to='scorelib.instrumentgroup')),
+                ('part', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='group_matches', to='scorelib.part')),
+            ],
+            options={
+                'unique_together': {('part', 'group')},
+            },
+        ),
+        migrations.RunPython(populate_matches, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-16 21:42
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max
+from django.utils import timezone
+
+
+def populate_download_open_until(apps, schema_editor):
+    Piece = apps.get_model('scorelib', 'Piece')
+    grace_period = timedelta(days=getattr(settings, 'SCORELIB_DOWNLOAD_GRACE_DAYS', 14))
+
+    changed = []
+    for piece in Piece.objects.annotate(last_concert=Max('concerts__date')):
+        if piece.last_concert is not None:
+            piece.download_open_until = timezone.localdate(piece.last_concert) + grace_period
+            changed.append(piece)
+    Piece.objects.bulk_update(changed, ['download_open_until'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scorelib', '0018_partgroupmatch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='piece',
+            name='download_open_until',
+            field=models.DateField(blank=True, editable=False, help_text='Letztes Konzertdatum + Karenzzeit; wird automatisch gepflegt.', null=True, verbose_name='Download möglich bis'),
+        ),
+        migrations.RunPython(populate_download_open_until, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.8 on 2026-10-17 09:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scorelib', '0019_piece_download_open_until'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='audiorecording',
+            name='duration',
+            field=models.DurationField(blank=True, editable=False, null=True, verbose_name='Dauer'),
+        ),
+        migrations.AddField(
+            model_name='audiorecording',
+            name='file_mtime',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Datei geändert'),
+        ),
+        migrations.AddField(
+            model_name='audiorecording',
+            name='file_size',
+            field=models.PositiveBigIntegerField(blank=True, editable=False, null=True, verbose_name='Dateigröße (Bytes)'),
+        ),
+        migrations.AddField(
+            model_name='audiorecording',
+            name='sha256',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=64, verbose_name='SHA-256'),
+        ),
+        migrations.AddField(
+            model_name='part',
+            name='file_mtime',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Datei geändert'),
+        ),
+        migrations.AddField(
+            model_name='part',
+            name='file_size',
+            field=models.PositiveBigIntegerField(blank=True, editable=False, null=True, verbose_name='Dateigröße (Bytes)'),
+        ),
+        migrations.AddField(
+            model_name='part',
+            name='page_count',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Seiten'),
+        ),
+        migrations.AddField(
+            model_name='part',
+            name='sha256',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=64, verbose_name='SHA-256'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-17 10:25
+
+import scorelib.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scorelib', '0020_file_fingerprints'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='part',
+            name='pdf_file',
+            field=models.FileField(storage=scorelib.storage.get_part_storage, upload_to='sheet_music/parts/'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-17 11:05
+
+import scorelib.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scorelib', '0021_part_storage'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='audiorecording',
+            name='audio_file',
+            field=models.FileField(upload_to=scorelib.storage.ShardedUploadTo('concerts/audio/')),
+        ),
+        migrations.AlterField(
+            model_name='part',
+            name='pdf_file',
+            field=models.FileField(storage=scorelib.storage.get_part_storage, upload_to=scorelib.storage.ShardedUploadTo('sheet_music/parts/')),
+        ),
+    ]
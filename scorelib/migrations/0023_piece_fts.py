@@ -0,0 +1,52 @@
+# Generated by Django 5.2.8 on 2026-10-17 11:50
+
+from django.db import DatabaseError, migrations
+
+# frozen copy of scorelib.search_index at the time of this migration
+FTS_TABLE = 'scorelib_piece_fts'
+
+CREATE_FTS_SQL = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+    title, additional_info, archive_label, composer, arranger, publisher,
+    tokenize = 'unicode61 remove_diacritics 2'
+)
+"""
+
+INDEX_INSERT_SQL = f"""
+INSERT INTO {FTS_TABLE}
+    (rowid, title, additional_info, archive_label, composer, arranger, publisher)
+SELECT p.id, p.title, COALESCE(p.additional_info, ''), COALESCE(p.archive_label, ''),
+       COALESCE(c.name, ''), COALESCE(a.name, ''), COALESCE(pub.name, '')
+FROM scorelib_piece p
+LEFT JOIN scorelib_composer c ON c.id = p.composer_id
+LEFT JOIN scorelib_arranger a ON a.id = p.arranger_id
+LEFT JOIN scorelib_publisher pub ON pub.id = p.publisher_id
+"""
+
+
+def create_index(apps, schema_editor):
+    # SQLite only; on PostgreSQL the search keeps using the ORM query
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        try:
+            cursor.execute(CREATE_FTS_SQL)
+        except DatabaseError:
+            return  # SQLite built without FTS5
+        cursor.execute(INDEX_INSERT_SQL)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scorelib', '0022_sharded_upload_to'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
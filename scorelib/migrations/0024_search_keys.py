@@ -0,0 +1,106 @@
+# Generated by Django 5.2.8 on 2026-10-17 12:30
+
+import unicodedata
+
+from django.db import DatabaseError, migrations, models
+
+# frozen copies of scorelib.matching.normalize_search_text and of the
+# scorelib.search_index helpers at the time of this migration
+
+# letters NFKD does not decompose into base letter + accent
+SEARCH_TRANSLATION = str.maketrans(
+    {'ø': 'o', 'ł': 'l', 'đ': 'd', 'ð': 'd', 'æ': 'ae', 'œ': 'oe', 'þ': 'th', 'ı': 'i'}
+)
+
+
+def normalize_search_text(value):
+    value = (value or '').casefold().translate(SEARCH_TRANSLATION)
+    value = ''.join(
+        c for c in unicodedata.normalize('NFKD', value) if not unicodedata.combining(c)
+    )
+    return ' '.join(value.split())
+
+
+def update_search_keys(apps, sources):
+    for model_name, source in sources:
+        model = apps.get_model('scorelib', model_name)
+        stale = []
+        for obj in model.objects.only('pk', source, 'search_key').iterator():
+            key = normalize_search_text(getattr(obj, source))[:255]
+            if obj.search_key != key:
+                obj.search_key = key
+                stale.append(obj)
+        model.objects.bulk_update(stale, ['search_key'], batch_size=500)
+
+
+FTS_TABLE = 'scorelib_piece_fts'
+
+CREATE_FTS_SQL = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+    title, additional_info, archive_label, composer, arranger, publisher,
+    tokenize = 'unicode61 remove_diacritics 2'
+)
+"""
+
+INDEX_INSERT_SQL = f"""
+INSERT INTO {FTS_TABLE}
+    (rowid, title, additional_info, archive_label, composer, arranger, publisher)
+SELECT p.id, p.search_key, COALESCE(p.additional_info, ''), COALESCE(p.archive_label, ''),
+       COALESCE(c.search_key, ''), COALESCE(a.search_key, ''), COALESCE(pub.search_key, '')
+FROM scorelib_piece p
+LEFT JOIN scorelib_composer c ON c.id = p.composer_id
+LEFT JOIN scorelib_arranger a ON a.id = p.arranger_id
+LEFT JOIN scorelib_publisher pub ON pub.id = p.publisher_id
+"""
+
+SOURCES = (
+    ('Piece', 'title'),
+    ('Composer', 'name'),
+    ('Arranger', 'name'),
+    ('Publisher', 'name'),
+)
+
+
+def populate_search_keys(apps, schema_editor):
+    update_search_keys(apps, SOURCES)
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    # re-fill the FTS index from the keys
+    with schema_editor.connection.cursor() as cursor:
+        try:
+            cursor.execute(CREATE_FTS_SQL)
+        except DatabaseError:
+            return  # SQLite built without FTS5
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(INDEX_INSERT_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scorelib', '0023_piece_fts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='arranger',
+            name='search_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='composer',
+            name='search_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='piece',
+            name='search_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='publisher',
+            name='search_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255),
+        ),
+        migrations.RunPython(populate_search_keys, migrations.RunPython.noop),
+    ]
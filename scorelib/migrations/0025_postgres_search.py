@@ -0,0 +1,64 @@
+# Generated by Django 5.2.8 on 2026-10-17 13:05
+
+from django.db import migrations
+
+# PostgreSQL only (scorelib.search_backends.PostgresSearchBackend); on SQLite
+# the FTS5 table from 0023 is used. Frozen copy of the SQL at this migration.
+SETUP_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "ALTER TABLE scorelib_piece ADD COLUMN IF NOT EXISTS search_vector tsvector",
+    "CREATE INDEX IF NOT EXISTS scorelib_piece_search_vector_gin "
+    "ON scorelib_piece USING GIN (search_vector)",
+    "CREATE INDEX IF NOT EXISTS scorelib_composer_search_key_trgm "
+    "ON scorelib_composer USING GIN (search_key gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS scorelib_arranger_search_key_trgm "
+    "ON scorelib_arranger USING GIN (search_key gin_trgm_ops)",
+]
+
+FILL_SQL = """
+UPDATE scorelib_piece AS p SET search_vector = src.vector
+FROM (
+    SELECT p2.id,
+           setweight(to_tsvector('simple', p2.search_key), 'A')
+           || setweight(to_tsvector('simple', COALESCE(p2.archive_label, '')), 'A')
+           || setweight(to_tsvector('simple', concat_ws(' ', c.search_key, a.search_key, pub.search_key)), 'B')
+           || setweight(to_tsvector('simple', COALESCE(p2.additional_info, '')), 'C') AS vector
+    FROM scorelib_piece p2
+    LEFT JOIN scorelib_composer c ON c.id = p2.composer_id
+    LEFT JOIN scorelib_arranger a ON a.id = p2.arranger_id
+    LEFT JOIN scorelib_publisher pub ON pub.id = p2.publisher_id
+) AS src
+WHERE src.id = p.id
+"""
+
+DROP_SQL = [
+    "DROP INDEX IF EXISTS scorelib_arranger_search_key_trgm",
+    "DROP INDEX IF EXISTS scorelib_composer_search_key_trgm",
+    "ALTER TABLE scorelib_piece DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def create_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in SETUP_SQL:
+        schema_editor.execute(sql)
+    schema_editor.execute(FILL_SQL)
+
+
+def drop_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in DROP_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scorelib', '0024_search_keys'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_vector, drop_search_vector),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.8 on 2026-10-17 13:40
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# frozen copy of scorelib.fuzzy_search.piece_trigrams (and of the
+# normalization it uses) at the time of this migration
+
+# letters NFKD does not decompose into base letter + accent
+SEARCH_TRANSLATION = str.maketrans(
+    {'ø': 'o', 'ł': 'l', 'đ': 'd', 'ð': 'd', 'æ': 'ae', 'œ': 'oe', 'þ': 'th', 'ı': 'i'}
+)
+
+
+def normalize_search_text(value):
+    value = (value or '').casefold().translate(SEARCH_TRANSLATION)
+    value = ''.join(
+        c for c in unicodedata.normalize('NFKD', value) if not unicodedata.combining(c)
+    )
+    return ' '.join(value.split())
+
+
+def piece_trigrams(*keys):
+    result = set()
+    text = ' '.join(key for key in keys if key)
+    for word in re.findall(r'\w+', normalize_search_text(text)):
+        padded = f'  {word} '
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+def build_trigrams(apps, schema_editor):
+    Piece = apps.get_model('scorelib', 'Piece')
+    PieceTrigram = apps.get_model('scorelib', 'PieceTrigram')
+    rows = Piece.objects.values_list(
+        'pk', 'search_key', 'composer__search_key', 'arranger__search_key'
+    )
+    PieceTrigram.objects.bulk_create(
+        [
+            PieceTrigram(piece_id=pk, trigram=trigram)
+            for pk, *keys in rows
+            for trigram in piece_trigrams(*keys)
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scorelib', '0025_postgres_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PieceTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3)),
+                ('piece', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trigrams', to='scorelib.piece')),
+            ],
+            options={
+                'unique_together': {('trigram', 'piece')},
+            },
+        ),
+        migrations.RunPython(build_trigrams, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-17 15:10
+
+from django.db import migrations, models
+
+
+# frozen copy of scorelib.matching.normalize_part_name
+def normalize_part_name(part_name):
+    return (part_name or '').strip().lower()
+
+
+def populate_part_keys(apps, schema_editor):
+    Part = apps.get_model('scorelib', 'Part')
+    parts = list(Part.objects.only('pk', 'part_name'))
+    for part in parts:
+        part.part_key = normalize_part_name(part.part_name)[:100]
+    Part.objects.bulk_update(parts, ['part_key'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scorelib', '0027_genre_search_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='part',
+            name='part_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=100),
+        ),
+        migrations.RunPython(populate_part_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:02
+
+import unicodedata
+
+from django.db import migrations, models
+
+# frozen copies of scorelib.matching.normalize_search_text and
+# scorelib.search_index.update_search_keys at the time of this migration
+
+# letters NFKD does not decompose into base letter + accent
+SEARCH_TRANSLATION = str.maketrans(
+    {'ø': 'o', 'ł': 'l', 'đ': 'd', 'ð': 'd', 'æ': 'ae', 'œ': 'oe', 'þ': 'th', 'ı': 'i'}
+)
+
+
+def normalize_search_text(value):
+    value = (value or '').casefold().translate(SEARCH_TRANSLATION)
+    value = ''.join(
+        c for c in unicodedata.normalize('NFKD', value) if not unicodedata.combining(c)
+    )
+    return ' '.join(value.split())
+
+
+def update_search_keys(apps, sources):
+    for model_name, source in sources:
+        model = apps.get_model('scorelib', model_name)
+        stale = []
+        for obj in model.objects.only('pk', source, 'search_key').iterator():
+            key = normalize_search_text(getattr(obj, source))[:255]
+            if obj.search_key != key:
+                obj.search_key = key
+                stale.append(obj)
+        model.objects.bulk_update(stale, ['search_key'], batch_size=500)
+
+
+def populate_concert_keys(apps, schema_editor):
+    update_search_keys(apps, [('Concert', 'title')])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scorelib', '0028_part_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='concert',
+            name='search_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255),
+        ),
+        migrations.RunPython(populate_concert_keys, migrations.RunPython.noop),
+    ]
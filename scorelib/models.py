@@ -17,16 +17,35 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
 import re
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 from datetime import timedelta
-import fnmatch
+
+from .matching import (
+    compile_filter_strings,
+    normalize_part_name,
+    normalize_search_text,
+    part_name_matches,
+)
+from .storage import ShardedUploadTo, get_part_storage
 
 # --- Core Data ---
 
-class Genre(models.Model):
+class SearchKeyModel(models.Model):
+    """Name tables that are searched via their normalized `search_key`."""
+    search_key = models.CharField(max_length=255, blank=True, editable=False, db_index=True)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        self.search_key = normalize_search_text(self.name)[:255]
+        super().save(*args, **kwargs)
+
+class Genre(SearchKeyModel):
     name = models.CharField(max_length=100, unique=True)
 
     def __str__(self):
@@ -41,7 +60,7 @@ class Venue(models.Model):
 
 # --- Normalized Entities ---
 
-class Composer(models.Model):
+class Composer(SearchKeyModel):
     name = models.CharField(max_length=200, unique=True)
 
     class Meta:
@@ -50,7 +69,7 @@ class Composer(models.Model):
     def __str__(self):
         return self.name
 
-class Arranger(models.Model):
+class Arranger(SearchKeyModel):
     name = models.CharField(max_length=200, unique=True)
 
     class Meta:
@@ -59,7 +78,7 @@ class Arranger(models.Model):
     def __str__(self):
         return self.name
 
-class Publisher(models.Model):
+class Publisher(SearchKeyModel):
     name = models.CharField(max_length=200, unique=True)
 
     class Meta:
@@ -78,15 +97,14 @@ class InstrumentGroup(models.Model):
     def __str__(self):
         return self.name
         
+    @property
+    def matcher(self):
+        """Compiled (and process-cached) regex for this group's filter patterns."""
+        return compile_filter_strings(self.filter_strings)
+
     def matches_part(self, part_name):
         """Check if the part name matches this group's filter patterns."""
-        if not self.filter_strings:
-            return False
-        
-        part_name_lower = part_name.strip().lower()
-        filters = [f.strip().lower() for f in self.filter_strings.split(',') if f.strip()]
-        
-        return any(fnmatch.fnmatch(part_name_lower, f) for f in filters)
+        return part_name_matches(self.matcher, part_name)
 
 class MusicianProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
@@ -96,9 +114,28 @@ class MusicianProfile(models.Model):
         verbose_name="Vollzugriff auf Archiv"
     )
 
+    _instrument_groups_cache = None
+
+    def get_instrument_groups(self):
+        """
+        Return the assigned instrument groups. They are loaded once per
+        profile instance (or taken from a prefetch) and reused afterwards.
+        """
+        if self._instrument_groups_cache is None:
+            self._instrument_groups_cache = list(self.instrument_groups.all())
+        return self._instrument_groups_cache
+
+    def clear_instrument_groups_cache(self):
+        self._instrument_groups_cache = None
+
+    def get_part_matcher(self):
+        """One combined matcher for all assigned instrument groups."""
+        filter_strings = sorted(g.filter_strings for g in self.get_instrument_groups())
+        return compile_filter_strings(*filter_strings)
+
     def can_view_part(self, part_name):
         """Check if any assigned instrument group matches this part."""
-        return any(group.matches_part(part_name) for group in self.instrument_groups.all())
+        return part_name_matches(self.get_part_matcher(), part_name)
         
     def __str__(self):
         return f"Profile of {self.user.username}"
@@ -129,8 +166,36 @@ class SiteSettings(models.Model):
 
 # --- Music Library ---
 
+def get_download_grace_period():
+    """Configured via SCORELIB_DOWNLOAD_GRACE_DAYS (default: 14 days)."""
+    return timedelta(days=getattr(settings, 'SCORELIB_DOWNLOAD_GRACE_DAYS', 14))
+
+def compute_download_open_until(last_concert_date):
+    """Last day on which parts of a piece played at `last_concert_date` are downloadable."""
+    if last_concert_date is None:
+        return None
+    return timezone.localdate(last_concert_date) + get_download_grace_period()
+
+class PieceQuerySet(models.QuerySet):
+    def update_download_open_until(self):
+        """
+        Recompute download_open_until (latest concert date + grace period)
+        for all pieces in this queryset. Returns the number of changed pieces.
+        """
+        changed = []
+        for piece in self.annotate(last_concert=models.Max('concerts__date')).only(
+            'pk', 'download_open_until'
+        ):
+            value = compute_download_open_until(piece.last_concert)
+            if piece.download_open_until != value:
+                piece.download_open_until = value
+                changed.append(piece)
+        self.model.objects.bulk_update(changed, ['download_open_until'], batch_size=500)
+        return len(changed)
+
 class Piece(models.Model):
     title = models.CharField(max_length=200)
+    search_key = models.CharField(max_length=255, blank=True, editable=False, db_index=True)
     additional_info = models.TextField(
         blank=True, 
         null=True, 
@@ -163,6 +228,19 @@ class Piece(models.Model):
         verbose_name="Eigentum",
         help_text="Haken weg, wenn wir das Stück von jemand anderem geliehen haben."
     )
+    download_open_until = models.DateField(
+        blank=True,
+        null=True,
+        editable=False,
+        verbose_name="Download möglich bis",
+        help_text="Letztes Konzertdatum + Karenzzeit; wird automatisch gepflegt."
+    )
+
+    objects = PieceQuerySet.as_manager()
+
+    def save(self, *args, **kwargs):
+        self.search_key = normalize_search_text(self.title)[:255]
+        super().save(*args, **kwargs)
 
     @property
     def current_status(self):
@@ -190,13 +268,16 @@ class Piece(models.Model):
         """
         Check if the piece should be available for download to regular musicians.
         A piece is active if it is linked to a concert that is in the future
-        or took place less than 14 days ago.
+        or took place less than SCORELIB_DOWNLOAD_GRACE_DAYS days ago.
+
+        This is a plain comparison against the denormalized
+        download_open_until column, which is kept current by signals on
+        Concert and ProgramItem (see scorelib.signals).
         """
-        grace_period = 14  # in days
-        deadline = timezone.now().date() - timedelta(days=grace_period)
-        
-        # Check if there is a linked concert that is after the deadline
-        return self.concerts.filter(date__gte=deadline).exists()
+        return (
+            self.download_open_until is not None
+            and self.download_open_until >= timezone.localdate()
+        )
 
     def __str__(self):
         artists = []
@@ -206,14 +287,68 @@ class Piece(models.Model):
             artists.append(f"Arr. {self.arranger.name}")
         return f"{self.title} ({', '.join(artists)})"
 
+class PieceTrigram(models.Model):
+    """
+    Inverted trigram index over piece titles and composer/arranger names for
+    the typo-tolerant search. Maintained by signals (see scorelib.fuzzy_search)
+    and rebuilt with `manage.py rebuild_piece_trigrams`.
+    """
+    trigram = models.CharField(max_length=3)
+    piece = models.ForeignKey(Piece, on_delete=models.CASCADE, related_name='trigrams')
+
+    class Meta:
+        unique_together = ('trigram', 'piece')
+
+    def __str__(self):
+        return f"{self.trigram!r} -> {self.piece_id}"
+
+class PartQuerySet(models.QuerySet):
+    def visible_to(self, groups):
+        """Parts matching any of the given instrument groups (via PartGroupMatch)."""
+        return self.filter(group_matches__group__in=groups).distinct()
+
+
 class Part(models.Model):
     piece = models.ForeignKey(Piece, on_delete=models.CASCADE, related_name='parts')
     part_name = models.CharField(max_length=100)
-    pdf_file = models.FileField(upload_to='sheet_music/parts/')
+    # part_name normalized like the InstrumentGroup filter patterns, see scorelib.part_search
+    part_key = models.CharField(max_length=100, blank=True, editable=False, db_index=True)
+    pdf_file = models.FileField(upload_to=ShardedUploadTo('sheet_music/parts/'), storage=get_part_storage)
+
+    # file fingerprint, kept current by scorelib.fingerprints (signals and
+    # `manage.py update_file_fingerprints`) so nobody has to read the file
+    file_size = models.PositiveBigIntegerField(null=True, blank=True, editable=False, verbose_name="Dateigröße (Bytes)")
+    sha256 = models.CharField(max_length=64, blank=True, editable=False, db_index=True, verbose_name="SHA-256")
+    page_count = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Seiten")
+    file_mtime = models.DateTimeField(null=True, blank=True, editable=False, verbose_name="Datei geändert")
+
+    objects = PartQuerySet.as_manager()
+
+    def save(self, *args, **kwargs):
+        self.part_key = normalize_part_name(self.part_name)[:100]
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'part_name' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'part_key'}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.part_name} - {self.piece.title}"
 
+class PartGroupMatch(models.Model):
+    """
+    Materialized result of InstrumentGroup.matches_part() for every part.
+    Maintained by signals (see scorelib.visibility) and rebuilt with
+    `manage.py rebuild_part_group_matches`.
+    """
+    part = models.ForeignKey(Part, on_delete=models.CASCADE, related_name='group_matches')
+    group = models.ForeignKey(InstrumentGroup, on_delete=models.CASCADE, related_name='part_matches')
+
+    class Meta:
+        unique_together = ('part', 'group')
+
+    def __str__(self):
+        return f"{self.part.part_name} -> {self.group.name}"
+
 class LoanRecord(models.Model):
     piece = models.ForeignKey(Piece, on_delete=models.CASCADE, related_name='loan_records')
     partner_name = models.CharField(max_length=200, verbose_name="Partner (Verein/Person/Verlag)")
@@ -251,11 +386,13 @@ class Concert(models.Model):
     )
     date = models.DateTimeField(blank=True, null=True)
     sort_date = models.DateField(editable=False, null=True)
+    search_key = models.CharField(max_length=255, blank=True, editable=False, db_index=True)
     venue = models.ForeignKey(Venue, on_delete=models.SET_NULL, null=True)
     poster = models.ImageField(upload_to='concerts/posters/', blank=True, null=True)
     program = models.ManyToManyField(Piece, through='ProgramItem', related_name='concerts')
 
     def save(self, *args, **kwargs):
+        self.search_key = normalize_search_text(self.title)[:255]
         if self.date:
             self.sort_date = self.date
         else:
@@ -285,9 +422,15 @@ class ProgramItem(models.Model):
 class AudioRecording(models.Model):
     concert = models.ForeignKey(Concert, on_delete=models.CASCADE, related_name='recordings')
     piece = models.ForeignKey(Piece, on_delete=models.CASCADE)
-    audio_file = models.FileField(upload_to='concerts/audio/')
+    audio_file = models.FileField(upload_to=ShardedUploadTo('concerts/audio/'))
     description = models.CharField(max_length=200, blank=True)
 
+    # file fingerprint, see Part
+    file_size = models.PositiveBigIntegerField(null=True, blank=True, editable=False, verbose_name="Dateigröße (Bytes)")
+    sha256 = models.CharField(max_length=64, blank=True, editable=False, db_index=True, verbose_name="SHA-256")
+    duration = models.DurationField(null=True, blank=True, editable=False, verbose_name="Dauer")
+    file_mtime = models.DateTimeField(null=True, blank=True, editable=False, verbose_name="Datei geändert")
+
     def __str__(self):
         return f"{self.piece.title} @ {self.concert.title}"
     
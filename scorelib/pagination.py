@@ -0,0 +1,191 @@
+"""
+SKG Notenbank - Sheet Music Database and Archive Management System
+Copyright (C) 2026 Arno Euteneuer
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import datetime
+import math
+
+from django.core import signing
+from django.db.models import F, Q
+
+from .search_cache import LRUCache, get_search_version
+
+# Keyset ("seek") pagination: instead of COUNT(*) + OFFSET, a page starts
+# right after the sort key of the last row of the previous page, so every
+# page costs the same however deep it is. The cursors in the links are
+# signed and opaque; they also carry the page number for display.
+
+CURSOR_SALT = "scorelib.keyset-cursor"
+
+_counts = LRUCache(256)
+
+
+class KeysetPage:
+    def __init__(self, object_list, number, num_pages, count, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.number = number
+        self.num_pages = num_pages
+        self.count = count
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+
+def cached_count(queryset):
+    """
+    COUNT(*) of `queryset`, cached per process until the search version
+    changes (see scorelib.search_cache: bumped on every piece or concert
+    change), so paging through a filtered list counts it only once.
+    """
+    _counts.validate(get_search_version())
+    sql, params = queryset.query.sql_with_params()
+    key = (sql, tuple(params))
+    count = _counts.get(key)
+    if count is None:
+        count = queryset.count()
+        _counts.set(key, count)
+    return count
+
+
+def _dump(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return value
+
+
+def _order(field, descending):
+    # NULL sorts as the smallest value on every database
+    if descending:
+        return F(field).desc(nulls_last=True)
+    return F(field).asc(nulls_first=True)
+
+
+def _after(field, descending, value):
+    """Rows strictly after `value` in this column's order."""
+    if descending:
+        if value is None:
+            return Q(pk__in=[])
+        return Q(**{f"{field}__lt": value}) | Q(**{f"{field}__isnull": True})
+    if value is None:
+        return Q(**{f"{field}__isnull": False})
+    return Q(**{f"{field}__gt": value})
+
+
+def _equal(field, value):
+    if value is None:
+        return Q(**{f"{field}__isnull": True})
+    return Q(**{field: value})
+
+
+def _seek(keys, values):
+    """Rows after `values` in the lexicographic order of `keys`."""
+    condition = Q(pk__in=[])
+    prefix = Q()
+    for (field, descending, alias), value in zip(keys, values):
+        condition |= prefix & _after(alias, descending, value)
+        prefix &= _equal(alias, value)
+    return condition
+
+
+def without_cursor(query_dict):
+    """The request's GET parameters for links that start at the first page."""
+    params = query_dict.copy()
+    params.pop("cursor", None)
+    params.pop("page", None)
+    return params
+
+
+def keyset_page(queryset, ordering, cursor=None, per_page=50, signature=""):
+    """
+    One page of `queryset` ordered by `ordering`, a list of (field,
+    descending) pairs that must end in a unique column such as ("pk",
+    False). `cursor` is a value from a previous page's next_cursor or
+    previous_cursor (or "last"); invalid or foreign cursors, e.g. from a
+    different sort order (`signature`), start at the first page.
+    """
+    keys = [(field, descending, f"keyset_{i}") for i, (field, descending) in enumerate(ordering)]
+    base = queryset
+    queryset = queryset.annotate(**{alias: F(field) for field, _, alias in keys})
+
+    state = {}
+    if cursor == "last":
+        state = {"d": "p", "n": None}
+    elif cursor:
+        try:
+            state = signing.loads(cursor, salt=CURSOR_SALT)
+        except signing.BadSignature:
+            state = {}
+        if state.get("s") != signature:
+            state = {}
+
+    backwards = state.get("d") == "p"
+    if backwards:
+        keys_in_order = [(field, not descending, alias) for field, descending, alias in keys]
+    else:
+        keys_in_order = keys
+
+    count = cached_count(base)
+    num_pages = max(1, math.ceil(count / per_page))
+    number = state.get("n") or (num_pages if backwards else 1)
+    # the last page holds the remainder, so that its boundaries match the
+    # ones reached by paging forward
+    size = per_page
+    if backwards and state.get("k") is None:
+        size = count - (num_pages - 1) * per_page or per_page
+
+    rows = queryset.order_by(*[_order(alias, descending) for _, descending, alias in keys_in_order])
+    if state.get("k") is not None:
+        rows = rows.filter(_seek(keys_in_order, state["k"]))
+    rows = list(rows[:size + 1])
+    if not rows and state.get("k") is not None:
+        # nothing left after the cursor's anchor, e.g. because its rows were
+        # deleted or no longer match the filter: start over
+        return keyset_page(base, ordering, per_page=per_page, signature=signature)
+    more = len(rows) > size
+    rows = rows[:size]
+    if backwards:
+        rows.reverse()
+
+    def make_cursor(row, direction, page_number):
+        values = [_dump(getattr(row, alias)) for _, _, alias in keys]
+        return signing.dumps(
+            {"k": values, "d": direction, "n": page_number, "s": signature},
+            salt=CURSOR_SALT,
+            compress=True,
+        )
+
+    has_next = more if not backwards else state.get("k") is not None
+    has_previous = more if backwards else state.get("k") is not None
+    next_cursor = make_cursor(rows[-1], "n", number + 1) if rows and has_next else None
+    previous_cursor = (
+        make_cursor(rows[0], "p", number - 1) if rows and has_previous else None
+    )
+    return KeysetPage(rows, number, num_pages, count, next_cursor, previous_cursor)
@@ -0,0 +1,106 @@
+"""
+SKG Notenbank - Sheet Music Database and Archive Management System
+Copyright (C) 2026 Arno Euteneuer
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import math
+from itertools import groupby
+from operator import attrgetter
+
+from django.db.models import Q
+
+from .matching import split_filter_strings, wildcard_prefix, wildcard_regex
+from .models import Part, Piece
+from .pagination import cached_count
+
+PIECES_PER_PAGE = 50
+
+
+def part_name_filter(patterns):
+    """
+    Q for parts whose name matches one of the comma-separated wildcard
+    `patterns`, with the same semantics as InstrumentGroup.filter_strings
+    ("Tuba*, Bass in B*"). Evaluated in the database on Part.part_key; a
+    literal prefix additionally narrows the search via the index.
+    """
+    condition = Q(pk__in=[])
+    for pattern in split_filter_strings(patterns):
+        regex = wildcard_regex(pattern)
+        if regex is None:
+            continue  # e.g. "[z-a]" matches nothing
+        match = Q(part_key__regex=regex)
+        prefix = wildcard_prefix(pattern)
+        if prefix:
+            match &= Q(part_key__gte=prefix, part_key__lt=prefix + "\U0010ffff")
+        condition |= match
+    return condition
+
+
+class PartSearchPage:
+    """One page of search_parts(): pieces with their matching parts."""
+
+    def __init__(self, results, number, count, per_page, has_next):
+        self.results = results  # [(piece, [parts...]), ...]
+        self.number = number
+        self.count = count  # matching pieces
+        self.num_pages = max(1, math.ceil(count / per_page))
+        self.has_next = has_next
+        self.has_previous = number > 1
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    @property
+    def next_page_number(self):
+        return self.number + 1
+
+    @property
+    def previous_page_number(self):
+        return self.number - 1
+
+
+def search_parts(patterns, page=1, per_page=PIECES_PER_PAGE):
+    """
+    Page `page` of the pieces having parts that match `patterns`, ordered by
+    title, with those parts. Pages hold whole pieces; the parts of a page
+    come from a single query (the piece ids are a LIMIT subquery), and the
+    number of pieces is counted once per search version (cached_count).
+    """
+    condition = part_name_filter(patterns)
+    pieces = Piece.objects.filter(pk__in=Part.objects.filter(condition).values("piece_id"))
+    try:
+        page = max(int(page), 1)
+    except (TypeError, ValueError):
+        page = 1
+    offset = (page - 1) * per_page
+
+    # one piece more than needed tells whether there is a next page
+    piece_ids = pieces.order_by("title", "pk").values("pk")[offset:offset + per_page + 1]
+    parts = (
+        Part.objects.filter(condition, piece_id__in=piece_ids)
+        .select_related("piece", "piece__composer")
+        .order_by("piece__title", "piece_id", "part_key", "pk")
+    )
+    results = group_by_piece(parts)
+    return PartSearchPage(
+        results[:per_page], page, cached_count(pieces), per_page, len(results) > per_page
+    )
+
+
+def group_by_piece(parts):
+    """[(piece, [parts...]), ...] for parts ordered by piece."""
+    return [(piece, list(group)) for piece, group in groupby(parts, key=attrgetter("piece"))]
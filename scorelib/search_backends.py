@@ -0,0 +1,240 @@
+"""
+SKG Notenbank - Sheet Music Database and Archive Management System
+Copyright (C) 2026 Arno Euteneuer
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import search_index
+from .fuzzy_search import fuzzy_piece_ids
+from .matching import normalize_search_text
+
+
+class SearchBackend:
+    """
+    Full-text search over pieces (title, label, names, additional info).
+    The backend is chosen with SCORELIB_SEARCH_BACKEND; signals call
+    reindex_pieces() whenever a piece or one of its names changes.
+    """
+
+    def filter_pieces(self, queryset, query):
+        """Restrict a Piece queryset to the pieces matching `query`."""
+        raise NotImplementedError
+
+    def reindex_pieces(self, piece_ids):
+        pass
+
+    def rebuild(self):
+        """Rebuild the whole index; returns False if there is none."""
+        return False
+
+
+class DatabaseSearchBackend(SearchBackend):
+    """SQLite FTS5 index where available, the plain ORM query otherwise."""
+
+    def filter_pieces(self, queryset, query):
+        return search_index.filter_pieces(queryset, query)
+
+    def reindex_pieces(self, piece_ids):
+        search_index.reindex_pieces(piece_ids)
+
+    def rebuild(self):
+        return search_index.rebuild_index()
+
+
+# Keep in sync with migration 0025_postgres_search, which creates the column,
+# the GIN indexes and the pg_trgm extension.
+_PG_UPDATE_SQL = """
+UPDATE scorelib_piece AS p SET search_vector = src.vector
+FROM (
+    SELECT p2.id,
+           setweight(to_tsvector('simple', p2.search_key), 'A')
+           || setweight(to_tsvector('simple', COALESCE(p2.archive_label, '')), 'A')
+           || setweight(to_tsvector('simple', concat_ws(' ', c.search_key, a.search_key, pub.search_key)), 'B')
+           || setweight(to_tsvector('simple', COALESCE(p2.additional_info, '')), 'C') AS vector
+    FROM scorelib_piece p2
+    LEFT JOIN scorelib_composer c ON c.id = p2.composer_id
+    LEFT JOIN scorelib_arranger a ON a.id = p2.arranger_id
+    LEFT JOIN scorelib_publisher pub ON pub.id = p2.publisher_id
+) AS src
+WHERE src.id = p.id
+"""
+
+# prefix match in the tsvector, or a name that is trigram-similar to the
+# query (word similarity, so "tschaikowski" finds "peter tschaikowsky")
+_PG_MATCH_SQL = """
+SELECT id FROM scorelib_piece WHERE search_vector @@ to_tsquery('simple', %s)
+UNION
+SELECT p.id FROM scorelib_piece p
+JOIN scorelib_composer c ON c.id = p.composer_id WHERE %s <%% c.search_key
+UNION
+SELECT p.id FROM scorelib_piece p
+JOIN scorelib_arranger a ON a.id = p.arranger_id WHERE %s <%% a.search_key
+"""
+
+
+class PostgresSearchBackend(SearchBackend):
+    """
+    PostgreSQL: a `search_vector` tsvector column on scorelib_piece (GIN
+    index, filled from the search keys) plus pg_trgm indexes on the names.
+    Falls back to DatabaseSearchBackend on other databases.
+    """
+
+    def _active(self):
+        return connection.vendor == "postgresql"
+
+    def filter_pieces(self, queryset, query):
+        if not self._active():
+            return DatabaseSearchBackend().filter_pieces(queryset, query)
+        words = re.findall(r"\w+", normalize_search_text(query))
+        if not words:
+            return queryset if not query.strip() else queryset.none()
+        tsquery = " & ".join(f"{word}:*" for word in words)
+        key = " ".join(words)
+        return queryset.filter(pk__in=RawSQL(_PG_MATCH_SQL, [tsquery, key, key]))
+
+    def reindex_pieces(self, piece_ids):
+        piece_ids = [int(pk) for pk in piece_ids if pk]
+        if not piece_ids or not self._active():
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(f"{_PG_UPDATE_SQL} AND p.id = ANY(%s)", [piece_ids])
+
+    def rebuild(self):
+        if not self._active():
+            return False
+        with connection.cursor() as cursor:
+            cursor.execute(_PG_UPDATE_SQL)
+        return True
+
+
+_backend = None
+
+
+def get_search_backend():
+    global _backend
+    path = getattr(
+        settings,
+        "SCORELIB_SEARCH_BACKEND",
+        "scorelib.search_backends.DatabaseSearchBackend",
+    )
+    if _backend is None or _backend[0] != path:
+        _backend = (path, import_string(path)())
+    return _backend[1]
+
+
+def search_pieces(queryset, query):
+    """
+    Search with the configured backend. If that finds fewer than
+    SCORELIB_FUZZY_MIN_RESULTS pieces, pieces with similar titles or names
+    (trigram index, see scorelib.fuzzy_search) are added, best match first.
+    """
+    results = get_search_backend().filter_pieces(queryset, query)
+    min_results = getattr(settings, "SCORELIB_FUZZY_MIN_RESULTS", 3)
+    if not min_results or not query.strip():
+        return results
+
+    exact_ids = list(results.values_list("pk", flat=True)[:min_results])
+    if len(exact_ids) >= min_results:
+        return results
+    fuzzy_ids = [pk for pk in fuzzy_piece_ids(query) if pk not in exact_ids]
+    if not fuzzy_ids:
+        return results
+
+    ranking = Case(
+        *[When(pk=pk, then=Value(rank)) for rank, pk in enumerate(fuzzy_ids, 1)],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    return (
+        queryset.filter(pk__in=exact_ids + fuzzy_ids)
+        .annotate(fuzzy_rank=ranking)
+        .order_by("fuzzy_rank")
+    )
+
+
+# (field, points for exact / prefix / substring match of the whole query)
+RANK_FIELDS = (
+    ("search_key", (100, 60, 30)),
+    ("composer__search_key", (40, 25, 15)),
+    ("arranger__search_key", (40, 25, 15)),
+)
+RANK_LABEL = (50, 35, 20)
+RANK_ADDITIONAL_INFO = 5
+RANK_WORD = 10  # per query word found in the title
+RANK_RECENT = ((0, 15), (365, 8))  # (days since the download window closed, points)
+
+
+def _points(condition, points):
+    return Case(When(condition, then=Value(points)), default=Value(0), output_field=IntegerField())
+
+
+def _match_points(field, key, points, lookup_prefix=""):
+    exact, prefix, substring = points
+    return Case(
+        When(Q(**{f"{field}__{lookup_prefix}exact": key}), then=Value(exact)),
+        When(Q(**{f"{field}__{lookup_prefix}startswith": key}), then=Value(prefix)),
+        When(Q(**{f"{field}__{lookup_prefix}contains": key}), then=Value(substring)),
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def rank_pieces(queryset, query):
+    """
+    Order search results by relevance, computed in the database as one
+    `search_rank` annotation: exact > prefix > substring matches, title >
+    archive label > composer/arranger > additional info, plus a bonus for
+    pieces in a current or recent concert (via download_open_until).
+    """
+    key = normalize_search_text(query)
+    if not key:
+        return queryset
+    today = timezone.localdate()
+
+    score = Value(0)
+    for field, points in RANK_FIELDS:
+        score = score + _match_points(field, key, points)
+    score = score + _match_points("archive_label", query.strip(), RANK_LABEL, "i")
+    score = score + _points(Q(additional_info__icontains=query.strip()), RANK_ADDITIONAL_INFO)
+    # the CASE expressions are evaluated on the matching rows only, so these
+    # substring tests need no index
+    words = re.findall(r"\w+", key)
+    if len(words) > 1:
+        for word in words[:5]:
+            score = score + _points(Q(search_key__contains=word), RANK_WORD)
+    score = score + Case(
+        *[
+            When(download_open_until__gte=today - timedelta(days=days), then=Value(points))
+            for days, points in RANK_RECENT
+        ],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+    # fuzzy additions (see search_pieces) stay behind the real matches
+    ordering = ["fuzzy_rank"] if "fuzzy_rank" in queryset.query.annotations else []
+    return queryset.annotate(search_rank=score).order_by(
+        *ordering, F("search_rank").desc(), "title", "pk"
+    )
@@ -0,0 +1,147 @@
+"""
+SKG Notenbank - Sheet Music Database and Archive Management System
+Copyright (C) 2026 Arno Euteneuer
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils import timezone
+
+from .bundles import get_cache_dir
+from .matching import normalize_search_text
+
+# Live search results are cached in each worker process. Every change to the
+# searched data bumps a version token in a small file below
+# SCORELIB_CACHE_DIR, which all workers compare on each lookup, so a cache
+# never outlives a change made in another process.
+VERSION_FILE = "version"
+
+
+class LRUCache:
+    """Size-bounded mapping that evicts the least recently used entry."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._version = None
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def validate(self, version):
+        """Drop all entries if they were stored under a different `version`."""
+        with self._lock:
+            if self._version != version:
+                self._data.clear()
+                self._version = version
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+        }
+
+
+def _version_path():
+    return os.path.join(get_cache_dir("search"), VERSION_FILE)
+
+
+def get_search_version():
+    try:
+        with open(_version_path()) as f:
+            return f.read()
+    except FileNotFoundError:
+        return ""
+
+
+def bump_search_version():
+    """Invalidate the search caches of all processes."""
+    path = _version_path()
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        f.write(uuid.uuid4().hex)
+    os.replace(tmp_path, path)
+
+
+_cache = None
+
+
+def get_search_cache():
+    """This process' cache, or None if SCORELIB_SEARCH_CACHE_SIZE is 0."""
+    global _cache
+    max_size = getattr(settings, "SCORELIB_SEARCH_CACHE_SIZE", 500)
+    if not max_size:
+        return None
+    if _cache is None or _cache.max_size != max_size:
+        _cache = LRUCache(max_size)
+    return _cache
+
+
+def access_scope(access):
+    """What a user may see in search results: everything, or their groups."""
+    if access.has_full_access:
+        return "full"
+    return "groups:" + ",".join(str(pk) for pk in access.group_ids)
+
+
+def cached_search(query, access, compute):
+    """
+    Return compute() for this query and access scope, cached. The key also
+    contains the date because download windows end at midnight.
+    """
+    cache = get_search_cache()
+    if cache is None:
+        return compute()
+
+    cache.validate(get_search_version())
+    key = (normalize_search_text(query), access_scope(access), timezone.localdate())
+    result = cache.get(key)
+    if result is None:
+        result = compute()
+        cache.set(key, result)
+    return result
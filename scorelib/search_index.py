@@ -0,0 +1,177 @@
+"""
+SKG Notenbank - Sheet Music Database and Archive Management System
+Copyright (C) 2026 Arno Euteneuer
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import re
+
+from django.db import DatabaseError, connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .matching import normalize_search_text
+
+FTS_TABLE = "scorelib_piece_fts"
+
+CREATE_FTS_SQL = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+    title, additional_info, archive_label, composer, arranger, publisher,
+    tokenize = 'unicode61 remove_diacritics 2'
+)
+"""
+
+DROP_FTS_SQL = f"DROP TABLE IF EXISTS {FTS_TABLE}"
+
+# rowid of the FTS row is the piece id; titles and names are indexed by their
+# search keys so that e.g. "strasse" finds "Straße"
+_INDEX_INSERT_SQL = f"""
+INSERT INTO {FTS_TABLE}
+    (rowid, title, additional_info, archive_label, composer, arranger, publisher)
+SELECT p.id, p.search_key, COALESCE(p.additional_info, ''), COALESCE(p.archive_label, ''),
+       COALESCE(c.search_key, ''), COALESCE(a.search_key, ''), COALESCE(pub.search_key, '')
+FROM scorelib_piece p
+LEFT JOIN scorelib_composer c ON c.id = p.composer_id
+LEFT JOIN scorelib_arranger a ON a.id = p.arranger_id
+LEFT JOIN scorelib_publisher pub ON pub.id = p.publisher_id
+"""
+
+# (model, field the search_key is derived from)
+SEARCH_KEY_SOURCES = (
+    ("Piece", "title"),
+    ("Composer", "name"),
+    ("Arranger", "name"),
+    ("Publisher", "name"),
+    ("Genre", "name"),
+    ("Concert", "title"),
+)
+
+_fts_available = None
+
+
+def update_search_keys(get_model, sources=SEARCH_KEY_SOURCES, batch_size=500):
+    """
+    Recompute the stored search keys of `sources`; `get_model` is
+    apps.get_model so this also works inside migrations (which pass their
+    own `sources`). Returns the number of changed rows.
+    """
+    changed = 0
+    for model_name, source in sources:
+        model = get_model("scorelib", model_name)
+        stale = []
+        for obj in model.objects.only("pk", source, "search_key").iterator():
+            key = normalize_search_text(getattr(obj, source))[:255]
+            if obj.search_key != key:
+                obj.search_key = key
+                stale.append(obj)
+        model.objects.bulk_update(stale, ["search_key"], batch_size=batch_size)
+        changed += len(stale)
+    return changed
+
+
+def prefix_filter(prefix, field="search_key"):
+    """
+    Q for rows whose normalized `field` starts with the normalized `prefix`.
+    The range condition lets SQLite use the plain B-tree index (its LIKE is
+    case-insensitive and thus unindexed); PostgreSQL uses the pattern index
+    Django creates for indexed CharFields.
+    """
+    key = normalize_search_text(prefix)
+    return Q(**{
+        f"{field}__gte": key,
+        f"{field}__lt": key + "\U0010ffff",
+        f"{field}__startswith": key,
+    })
+
+
+def create_fts_table(conn):
+    """Create and fill the index; returns False if SQLite lacks FTS5."""
+    with conn.cursor() as cursor:
+        try:
+            cursor.execute(CREATE_FTS_SQL)
+        except DatabaseError:
+            return False
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        cursor.execute(_INDEX_INSERT_SQL)
+    return True
+
+
+def fts_available():
+    """Is the FTS5 index there? (SQLite only; PostgreSQL uses the ORM query.)"""
+    global _fts_available
+    if connection.vendor != "sqlite":
+        return False
+    if _fts_available is None:
+        _fts_available = FTS_TABLE in connection.introspection.table_names()
+    return _fts_available
+
+
+def reindex_pieces(piece_ids):
+    """Refresh the index rows of the given pieces (deleted ones just vanish)."""
+    piece_ids = [int(pk) for pk in piece_ids if pk]
+    if not piece_ids or not fts_available():
+        return
+    placeholders = ", ".join(["%s"] * len(piece_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})", piece_ids
+        )
+        cursor.execute(f"{_INDEX_INSERT_SQL} WHERE p.id IN ({placeholders})", piece_ids)
+
+
+def rebuild_index():
+    global _fts_available
+    if connection.vendor != "sqlite":
+        return False
+    _fts_available = create_fts_table(connection)
+    return _fts_available
+
+
+def fts_match_expression(query):
+    """
+    FTS5 query for `query`: every normalized word as a prefix, all words
+    required. Returns "" if the query contains no searchable word.
+    """
+    words = re.findall(r"\w+", normalize_search_text(query))
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def filter_pieces(queryset, query):
+    """
+    Restrict a Piece queryset to pieces matching the search `query`, via the
+    FTS5 index where available and the icontains query otherwise.
+    """
+    if fts_available():
+        expression = fts_match_expression(query)
+        if not expression:
+            return queryset if not query.strip() else queryset.none()
+        return queryset.filter(
+            pk__in=RawSQL(
+                f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+                [expression],
+            )
+        )
+
+    # substring matches (LIKE '%...%') cannot use the search_key indexes,
+    # which only serve prefix lookups such as prefix_filter(); this fallback
+    # scans the pieces
+    key = normalize_search_text(query)
+    return queryset.filter(
+        Q(search_key__contains=key)
+        | Q(archive_label__icontains=query)
+        | Q(composer__search_key__contains=key)
+        | Q(arranger__search_key__contains=key)
+        | Q(additional_info__icontains=query)
+    ).distinct()
@@ -16,11 +16,28 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import MusicianProfile, AudioRecording
+from .fingerprints import refresh_fingerprint
+from .matching import clear_matcher_cache
+from .models import (
+    Arranger,
+    AudioRecording,
+    Composer,
+    Concert,
+    InstrumentGroup,
+    MusicianProfile,
+    Part,
+    Piece,
+    ProgramItem,
+    Publisher,
+)
+from .fuzzy_search import sync_piece_trigrams
+from .search_backends import get_search_backend
+from .search_cache import bump_search_version
 from .utils import process_audio_file_logic
+from .visibility import sync_group_matches, sync_part_matches
 
 
 @receiver(post_save, sender=User)
@@ -34,6 +51,158 @@ def create_or_update_user_profile(sender, instance, created, **kwargs):
             instance.profile.save()
 
 
+@receiver(post_save, sender=InstrumentGroup)
+@receiver(post_delete, sender=InstrumentGroup)
+def invalidate_group_matchers(sender, instance, **kwargs):
+    # compiled matchers are keyed by their pattern text, so this only frees memory
+    clear_matcher_cache()
+
+
+@receiver(post_save, sender=InstrumentGroup)
+def update_group_part_matches(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    sync_group_matches(instance)
+
+
+@receiver(post_save, sender=Part)
+def update_part_group_matches(sender, instance, raw=False, update_fields=None, **kwargs):
+    # saves that do not touch the part name (e.g. file updates) keep their matches
+    if raw or (update_fields and 'part_name' not in update_fields):
+        return
+    sync_part_matches(instance)
+
+
+@receiver(m2m_changed, sender=MusicianProfile.instrument_groups.through)
+def invalidate_profile_groups(sender, instance, **kwargs):
+    if isinstance(instance, MusicianProfile):
+        instance.clear_instrument_groups_cache()
+
+
+def refresh_download_windows(piece_ids):
+    piece_ids = {pk for pk in piece_ids if pk}
+    if piece_ids:
+        Piece.objects.filter(pk__in=piece_ids).update_download_open_until()
+
+
+@receiver(post_save, sender=Concert)
+def update_download_windows_for_concert(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    refresh_download_windows(instance.programitem_set.values_list('piece_id', flat=True))
+
+
+@receiver(pre_save, sender=ProgramItem)
+def remember_previous_program_piece(sender, instance, raw=False, **kwargs):
+    # if a program item is moved to another piece, the old piece needs a refresh too
+    instance._previous_piece_id = None
+    if not raw and instance.pk:
+        instance._previous_piece_id = (
+            ProgramItem.objects.filter(pk=instance.pk)
+            .values_list('piece_id', flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=ProgramItem)
+def update_download_window_on_program_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    refresh_download_windows(
+        [instance.piece_id, getattr(instance, '_previous_piece_id', None)]
+    )
+
+
+@receiver(post_delete, sender=ProgramItem)
+def update_download_window_on_program_delete(sender, instance, **kwargs):
+    # also covers concerts being deleted (their program items cascade)
+    refresh_download_windows([instance.piece_id])
+
+
+@receiver(m2m_changed, sender=ProgramItem)
+def update_download_windows_on_program_change(sender, instance, action, reverse, pk_set, **kwargs):
+    # concert.program.add()/remove()/clear() and piece.concerts.add()/...
+    if action == 'pre_clear':
+        if reverse:
+            instance._cleared_piece_ids = [instance.pk]
+        else:
+            instance._cleared_piece_ids = list(
+                instance.programitem_set.values_list('piece_id', flat=True)
+            )
+    elif action == 'post_clear':
+        refresh_download_windows(getattr(instance, '_cleared_piece_ids', []))
+    elif action in ('post_add', 'post_remove'):
+        refresh_download_windows([instance.pk] if reverse else pk_set or [])
+
+
+def reindex_pieces(piece_ids):
+    """Update the search index and the fuzzy-search trigrams of these pieces."""
+    piece_ids = list(piece_ids)
+    get_search_backend().reindex_pieces(piece_ids)
+    sync_piece_trigrams(piece_ids)
+
+
+@receiver(post_save, sender=Piece)
+@receiver(post_delete, sender=Piece)
+def update_piece_search_index(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    reindex_pieces([instance.pk])
+
+
+@receiver(post_save, sender=Composer)
+@receiver(post_save, sender=Arranger)
+@receiver(post_save, sender=Publisher)
+def update_search_index_for_name(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    reindex_pieces(instance.pieces.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Composer)
+@receiver(pre_delete, sender=Arranger)
+@receiver(pre_delete, sender=Publisher)
+def remember_pieces_of_deleted_name(sender, instance, **kwargs):
+    # the pieces are detached (SET_NULL) without signals of their own
+    instance._search_piece_ids = list(instance.pieces.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Composer)
+@receiver(post_delete, sender=Arranger)
+@receiver(post_delete, sender=Publisher)
+def update_search_index_for_deleted_name(sender, instance, **kwargs):
+    reindex_pieces(getattr(instance, '_search_piece_ids', []))
+
+
+@receiver(post_save, sender=Piece)
+@receiver(post_delete, sender=Piece)
+@receiver(post_save, sender=Part)
+@receiver(post_delete, sender=Part)
+@receiver(post_save, sender=Composer)
+@receiver(post_delete, sender=Composer)
+@receiver(post_save, sender=Arranger)
+@receiver(post_delete, sender=Arranger)
+@receiver(post_save, sender=Publisher)
+@receiver(post_delete, sender=Publisher)
+@receiver(post_save, sender=Concert)
+@receiver(post_delete, sender=Concert)
+@receiver(post_save, sender=ProgramItem)
+@receiver(post_delete, sender=ProgramItem)
+@receiver(post_save, sender=InstrumentGroup)
+@receiver(post_delete, sender=InstrumentGroup)
+def invalidate_search_cache(sender, **kwargs):
+    # live search results show titles, names and the downloadable parts
+    bump_search_version()
+
+
+@receiver(m2m_changed, sender=ProgramItem)
+@receiver(m2m_changed, sender=Piece.genres.through)
+def invalidate_search_cache_on_m2m_change(sender, action, **kwargs):
+    # the cached archive/concert list counts depend on genres, too
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_search_version()
+
+
 @receiver(post_save, sender=AudioRecording)
 def handle_audio_upload_signal(sender, instance, created, update_fields, **kwargs):
     # WICHTIG: Wenn nur 'audio_file' geupdatet wurde, kommen wir aus der Utils-Funktion.
@@ -42,4 +211,14 @@ def handle_audio_upload_signal(sender, instance, created, update_fields, **kwarg
         return
     
     # Verarbeitung starten
-    process_audio_file_logic(instance)
\ No newline at end of file
+    process_audio_file_logic(instance)
+
+
+# registered after handle_audio_upload_signal so that converted/renamed audio
+# files are measured; unchanged files (same size and mtime) are not re-hashed
+@receiver(post_save, sender=Part)
+@receiver(post_save, sender=AudioRecording)
+def update_file_fingerprint(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    refresh_fingerprint(instance)
\ No newline at end of file
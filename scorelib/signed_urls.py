@@ -0,0 +1,108 @@
+"""
+SKG Notenbank - Sheet Music Database and Archive Management System
+Copyright (C) 2026 Arno Euteneuer
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import time
+
+from django.conf import settings
+from django.core import signing
+from django.urls import reverse
+
+# Pages that list parts or recordings have already done the permission check,
+# so they hand out short-lived signed links. Following such a link only needs
+# an HMAC check: no session, user, profile or part lookup. The link is not
+# tied to the session; the id of the user it was issued to ("u") is logged
+# with every download (see scorelib.web_views.downloads) to trace shared links.
+#
+# The signed timestamp is rounded down to SCORELIB_SIGNED_URL_BUCKET, so a
+# page rendered twice within the same bucket links to the same URL and the
+# browser can revalidate its cached copy (ETag/304) instead of downloading
+# the file again.
+
+KINDS = {
+    "part": ("protected_part_download", "signed_part_download"),
+    "audio": ("protected_audio_download", "signed_audio_download"),
+}
+
+
+class BucketTimestampSigner(signing.TimestampSigner):
+    """TimestampSigner whose timestamps are rounded down to `bucket` seconds."""
+
+    def __init__(self, *args, bucket=1, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.bucket = max(int(bucket), 1)
+
+    def timestamp(self):
+        now = int(time.time())
+        return signing.b62_encode(now - now % self.bucket)
+
+
+def _signer(kind):
+    return BucketTimestampSigner(
+        salt=f"scorelib.signed-download.{kind}", bucket=get_bucket()
+    )
+
+
+def get_max_age():
+    return getattr(settings, "SCORELIB_SIGNED_URL_MAX_AGE", 2 * 60 * 60)
+
+
+def get_bucket():
+    return getattr(settings, "SCORELIB_SIGNED_URL_BUCKET", 60 * 60)
+
+
+def signed_urls_enabled():
+    return getattr(settings, "SCORELIB_SIGNED_DOWNLOADS", True)
+
+
+def make_download_token(kind, object_id, user_id, file_name):
+    return _signer(kind).sign_object(
+        {"id": object_id, "u": user_id, "f": file_name}, compress=True
+    )
+
+
+def read_download_token(kind, token, check_age=True):
+    """
+    Return the payload of a valid token. Raises signing.SignatureExpired
+    for outdated tokens and signing.BadSignature for anything forged.
+    With check_age=False only the signature is verified.
+    """
+    # the timestamp may be up to one bucket older than the link itself
+    max_age = get_max_age() + get_bucket() if check_age else None
+    return _signer(kind).unsign_object(token, max_age=max_age)
+
+
+def download_url(kind, obj, file_field, user):
+    """Signed link for `obj` (a Part or AudioRecording), or the plain protected URL."""
+    return download_url_for(kind, obj.pk, file_field.name if file_field else "", user)
+
+
+def download_url_for(kind, object_id, file_name, user):
+    """download_url() from the object id and stored file name alone."""
+    protected_name, signed_name = KINDS[kind]
+    if not signed_urls_enabled() or not file_name:
+        return reverse(protected_name, args=[object_id])
+    token = make_download_token(kind, object_id, user.pk, file_name)
+    return reverse(signed_name, args=[token])
+
+
+def part_download_url(part, user):
+    return download_url("part", part, part.pdf_file, user)
+
+
+def audio_download_url(recording, user):
+    return download_url("audio", recording, recording.audio_file, user)
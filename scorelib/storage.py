@@ -0,0 +1,212 @@
+"""
+SKG Notenbank - Sheet Music Database and Archive Management System
+Copyright (C) 2026 Arno Euteneuer
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import errno
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.utils.deconstruct import deconstructible
+
+BLOB_DIR = "blobs"
+
+# errors of os.link() on filesystems without hard links (FAT/exFAT sticks,
+# different mount points); the file is copied instead
+_NO_HARDLINK_ERRORS = {errno.EXDEV, errno.EPERM, errno.ENOTSUP, errno.EMLINK}
+
+
+def link_or_copy(source, target):
+    try:
+        os.link(source, target)
+    except FileExistsError:
+        raise
+    except OSError as e:
+        if e.errno not in _NO_HARDLINK_ERRORS:
+            raise
+        shutil.copyfile(source, target)
+
+
+class DedupFileSystemStorage(FileSystemStorage):
+    """
+    Content-addressed variant of the media storage.
+
+    Every file is stored once as a blob below MEDIA_ROOT/blobs/ (named by its
+    SHA-256) and the usual file name, e.g. sheet_music/parts/xyz.pdf, is a
+    hard link to that blob. Names, URLs, nginx and backups keep working as
+    before, while identical uploads share their disk space. The link count
+    of a blob is its reference count: blobs nobody links to any more are
+    removed by collect_garbage().
+
+    Files must never be rewritten in place (that would change every name
+    linked to the blob); write a new file and os.replace() it instead.
+    """
+
+    def blob_name(self, sha256):
+        return f"{BLOB_DIR}/{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+    def _store_blob(self, chunks):
+        """Write `chunks` to the blob store and return the blob's path."""
+        blob_root = self.path(BLOB_DIR)
+        os.makedirs(blob_root, exist_ok=True)
+
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=blob_root, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in chunks:
+                    digest.update(chunk)
+                    f.write(chunk)
+            blob_path = self.path(self.blob_name(digest.hexdigest()))
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            if os.path.exists(blob_path):
+                os.remove(tmp_path)
+                if os.stat(blob_path).st_nlink == 1:
+                    # unreferenced so far: keep collect_garbage() away from it
+                    os.utime(blob_path)
+            else:
+                os.replace(tmp_path, blob_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return blob_path
+
+    def _save(self, name, content):
+        if hasattr(content, "seek"):
+            content.seek(0)
+        blob_path = self._store_blob(content.chunks())
+
+        while True:
+            full_path = self.path(name)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            try:
+                link_or_copy(blob_path, full_path)
+                break
+            except FileExistsError:
+                # somebody took the name in the meantime
+                name = self.get_available_name(name)
+
+        if self.file_permissions_mode is not None:
+            os.chmod(full_path, self.file_permissions_mode)
+        return str(name).replace("\\", "/")
+
+    def dedup_existing(self, name):
+        """
+        Turn an existing plain file into a link to its blob (in place, via a
+        temporary link and rename). Returns the number of bytes freed.
+        """
+        full_path = self.path(name)
+        stat = os.stat(full_path)
+        if stat.st_nlink > 1:
+            return 0  # already linked to a blob
+
+        with open(full_path, "rb") as f:
+            blob_path = self._store_blob(iter(lambda: f.read(1024 * 1024), b""))
+
+        freed = stat.st_size if os.stat(blob_path).st_nlink > 1 else 0
+        tmp_path = f"{full_path}.dedup-tmp"
+        link_or_copy(blob_path, tmp_path)
+        os.replace(tmp_path, full_path)
+        return freed
+
+    def collect_garbage(self, min_age=60 * 60, dry_run=False):
+        """
+        Delete blobs that are not linked from any file name any more. Blobs
+        younger than `min_age` seconds are kept so that a save in progress
+        cannot lose its blob. Returns (number of blobs, bytes).
+        """
+        count = size = 0
+        cutoff = time.time() - min_age
+        for root, dirs, files in os.walk(self.path(BLOB_DIR)):
+            for filename in files:
+                path = os.path.join(root, filename)
+                stat = os.stat(path)
+                if stat.st_nlink > 1 or stat.st_mtime > cutoff:
+                    continue
+                count += 1
+                size += stat.st_size
+                if not dry_run:
+                    os.remove(path)
+        return count, size
+
+
+def sharded_uploads_enabled():
+    return getattr(settings, "SCORELIB_SHARDED_UPLOADS", False)
+
+
+def shard_prefix(filename):
+    """Two directory levels from the hash of the file name, e.g. '3f/a2'."""
+    digest = hashlib.sha256(filename.encode()).hexdigest()
+    return f"{digest[:2]}/{digest[2:4]}"
+
+
+def is_shard_dir(name):
+    return len(name) == 2 and all(c in "0123456789abcdef" for c in name)
+
+
+def remove_empty_shard_dirs(file_path):
+    """After deleting `file_path`, remove the shard directories it leaves empty."""
+    directory = os.path.dirname(file_path)
+    for _ in range(2):
+        if not is_shard_dir(os.path.basename(directory)):
+            break
+        try:
+            os.rmdir(directory)
+        except OSError:
+            break  # not empty
+        directory = os.path.dirname(directory)
+
+
+@deconstructible
+class ShardedUploadTo:
+    """
+    upload_to for large flat media folders. With SCORELIB_SHARDED_UPLOADS
+    enabled new files go into two levels of hash-prefix directories
+    (sheet_music/parts/3f/a2/name.pdf), otherwise directly into `base_dir`
+    as before. Existing files are moved by `manage.py shard_media_files`.
+    """
+
+    def __init__(self, base_dir):
+        self.base_dir = base_dir.rstrip("/")
+
+    def __call__(self, instance, filename):
+        return self.path_for(filename)
+
+    def path_for(self, filename):
+        filename = os.path.basename(filename)
+        if not sharded_uploads_enabled():
+            return f"{self.base_dir}/{filename}"
+        return f"{self.base_dir}/{shard_prefix(filename)}/{filename}"
+
+    def __eq__(self, other):
+        return isinstance(other, ShardedUploadTo) and self.base_dir == other.base_dir
+
+
+def dedup_enabled():
+    return getattr(settings, "SCORELIB_DEDUP_STORAGE", False)
+
+
+def get_part_storage():
+    """Storage for Part.pdf_file, see SCORELIB_DEDUP_STORAGE."""
+    if dedup_enabled():
+        return DedupFileSystemStorage()
+    return default_storage
@@ -0,0 +1,76 @@
+"""
+SKG Notenbank - Sheet Music Database and Archive Management System
+Copyright (C) 2026 Arno Euteneuer
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import zipfile
+
+CHUNK_SIZE = 64 * 1024
+
+
+class _ZipOutput:
+    """
+    Write-only, non-seekable file object for ZipFile. Without seek() zipfile
+    writes data descriptors after each entry, so nothing written has to be
+    revisited and can be handed out immediately.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_zip(entries, chunk_size=CHUNK_SIZE):
+    """
+    Yield a ZIP archive of `entries` ((file_path, arcname) pairs) piece by
+    piece, reading each file in chunks, so memory use does not depend on the
+    archive size. Files are stored uncompressed (PDFs and MP3s are already
+    compressed); missing files are skipped.
+    """
+    output = _ZipOutput()
+    with zipfile.ZipFile(output, "w", compression=zipfile.ZIP_STORED) as zip_file:
+        for file_path, arcname in entries:
+            try:
+                source = open(file_path, "rb")
+            except FileNotFoundError:
+                continue
+            with source:
+                zinfo = zipfile.ZipInfo.from_file(file_path, arcname)
+                zinfo.compress_type = zipfile.ZIP_STORED
+                with zip_file.open(zinfo, "w") as target:
+                    while chunk := source.read(chunk_size):
+                        target.write(chunk)
+                        data = output.pop()
+                        if data:
+                            yield data
+            yield output.pop()
+    yield output.pop()
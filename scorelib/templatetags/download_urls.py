@@ -0,0 +1,35 @@
+"""
+SKG Notenbank - Sheet Music Database and Archive Management System
+Copyright (C) 2026 Arno Euteneuer
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from django import template
+
+from ..signed_urls import audio_download_url, part_download_url
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def part_url(context, part):
+    """{% part_url part %} -> signed download link for the current user."""
+    return part_download_url(part, context["request"].user)
+
+
+@register.simple_tag(takes_context=True)
+def audio_url(context, recording):
+    """{% audio_url rec %} -> signed streaming link for the current user."""
+    return audio_download_url(recording, context["request"].user)
@@ -16,38 +16,107 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
+import fnmatch
+import hashlib
+import io
+import os
+import random
+import re
 import shutil
 import tempfile
+import zipfile
+from unittest import skipUnless
 from unittest.mock import mock_open, patch
 
-from datetime import timedelta
+from datetime import datetime, timedelta
 
-from django.contrib.auth.models import User
+from pypdf import PdfReader, PdfWriter
+
+from django.contrib.auth.models import AnonymousUser, User
 from django.core.files.base import ContentFile
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import TestCase, override_settings
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
 from django.urls import reverse
 from django.utils import timezone
 
+from .access import AccessContext
+from .admin_actions import download_parts_as_zip, merge_names
+from .bundles import get_concert_folder_pdf
+from .file_serving import file_etag, parse_range_header, serve_protected_file
+from .fuzzy_search import fuzzy_piece_ids, trigrams
 from .models import (
+    Arranger,
     Composer,
     Concert,
+    Genre,
     InstrumentGroup,
     MusicianProfile,
     Part,
+    PartGroupMatch,
     Piece,
+    PieceTrigram,
     ProgramItem,
+    Publisher,
     AudioRecording,
 )
+from .matching import (
+    compile_filter_strings,
+    normalize_search_text,
+    part_name_matches,
+    wildcard_regex,
+)
+from .pagination import keyset_page
+from .search_backends import (
+    PostgresSearchBackend,
+    get_search_backend,
+    rank_pieces,
+    search_pieces,
+)
+from .part_search import search_parts
+from .search_cache import LRUCache, bump_search_version, get_search_cache, get_search_version
+from .search_index import filter_pieces, fts_available
+from .signed_urls import part_download_url
+from .storage import DedupFileSystemStorage
+from .streaming_zip import iter_zip
+
+
+_module_media = None
+_module_override = None
+
+
+def setUpModule():
+    # every piece/part save writes the search cache version below MEDIA_ROOT;
+    # keep that (and any test without its own MEDIA_ROOT) out of ./media
+    global _module_media, _module_override
+    _module_media = tempfile.mkdtemp(prefix="scorelib_test_media_")
+    _module_override = override_settings(MEDIA_ROOT=_module_media)
+    _module_override.enable()
+
+
+def tearDownModule():
+    _module_override.disable()
+    shutil.rmtree(_module_media, ignore_errors=True)
+
+
+def blank_pdf(pages=1):
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=595, height=842)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
 
 
 class ScorelibSmokeTests(TestCase):
     @classmethod
     def setUpClass(cls):
-        super().setUpClass()
+        # enable the override first: setUpTestData (run by super) saves files
         cls._temp_media = tempfile.mkdtemp(prefix="scorelib_test_media_")
         cls._override = override_settings(MEDIA_ROOT=cls._temp_media)
         cls._override.enable()
+        super().setUpClass()
 
     @classmethod
     def tearDownClass(cls):
@@ -149,18 +218,1393 @@ class ScorelibSmokeTests(TestCase):
     def test_part_download_allowed_for_staff_user(self):
         self.client.force_login(self.staff_user)
         with patch(
-            "scorelib.web_views.downloads.os.path.exists", return_value=True
+            "scorelib.file_serving.os.path.exists", return_value=True
         ), patch(
-            "scorelib.web_views.downloads.open", mock_open(read_data=b"%PDF-1.4 test")
+            "scorelib.file_serving.open", mock_open(read_data=b"%PDF-1.4 test")
         ):
             response = self.client.get(
                 reverse("protected_part_download", args=[self.part.id])
             )
         self.assertEqual(response.status_code, 200)
 
+    def test_concert_detail_lists_matching_parts(self):
+        self.client.force_login(self.regular_user)
+        response = self.client.get(reverse("concert_detail", args=[self.concert.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["program_data"][0]["user_parts"], [self.part])
+
     def test_part_download_denied_without_profile(self):
         self.client.force_login(self.user_without_profile)
         response = self.client.get(
             reverse("protected_part_download", args=[self.part.id])
         )
         self.assertEqual(response.status_code, 403)
+
+
+class InstrumentGroupMatcherTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.trumpets = InstrumentGroup.objects.create(
+            name="Trompete", filter_strings="Trompete*, Flügelhorn*, Cornet ?"
+        )
+        cls.tubas = InstrumentGroup.objects.create(name="Tuba", filter_strings="Tuba*")
+        cls.user = User.objects.create_user(username="musician", password="x")
+        cls.user.profile.instrument_groups.set([cls.trumpets, cls.tubas])
+
+    def test_group_matcher_follows_wildcard_rules(self):
+        self.assertTrue(self.trumpets.matches_part("  TROMPETE 1 in Bb "))
+        self.assertTrue(self.trumpets.matches_part("Flügelhorn 2"))
+        self.assertTrue(self.trumpets.matches_part("Cornet 3"))
+        self.assertFalse(self.trumpets.matches_part("Cornet 10"))
+        self.assertFalse(self.trumpets.matches_part("Posaune 1"))
+        self.assertFalse(InstrumentGroup(name="Leer", filter_strings="").matches_part("Tuba"))
+
+    def test_profile_checks_run_without_queries_after_first_load(self):
+        profile = MusicianProfile.objects.get(user=self.user)
+        self.assertTrue(profile.can_view_part("Tuba in C"))
+        with self.assertNumQueries(0):
+            self.assertTrue(profile.can_view_part("Trompete 2"))
+            self.assertFalse(profile.can_view_part("Posaune 1"))
+
+    def test_group_changes_are_picked_up(self):
+        profile = MusicianProfile.objects.get(user=self.user)
+        self.assertFalse(profile.can_view_part("Posaune 1"))
+
+        self.tubas.filter_strings = "Tuba*, Posaune*"
+        self.tubas.save()
+        profile = MusicianProfile.objects.get(user=self.user)
+        self.assertTrue(profile.can_view_part("Posaune 1"))
+
+        profile.instrument_groups.remove(self.tubas)
+        self.assertFalse(profile.can_view_part("Posaune 1"))
+
+
+class PartVisibilityTableTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.composer = Composer.objects.create(name="Holst")
+        cls.piece = Piece.objects.create(title="Suite in Es", composer=cls.composer)
+        cls.tuba = Part.objects.create(piece=cls.piece, part_name="Tuba 1")
+        cls.horn = Part.objects.create(piece=cls.piece, part_name="Horn in F")
+        cls.group = InstrumentGroup.objects.create(name="Tiefes Blech", filter_strings="Tuba*")
+        cls.user = User.objects.create_user(username="tubist", password="x")
+        cls.user.profile.instrument_groups.set([cls.group])
+
+    def test_part_save_updates_matches(self):
+        self.assertEqual(list(Part.objects.visible_to(self.user.profile.instrument_groups.all())), [self.tuba])
+
+        self.horn.part_name = "Tuba 2"
+        self.horn.save()
+        self.assertCountEqual(
+            Part.objects.visible_to(self.user.profile.instrument_groups.all()), [self.tuba, self.horn]
+        )
+
+    def test_group_change_updates_matches(self):
+        self.group.filter_strings = "Horn*"
+        self.group.save()
+        self.assertEqual(list(Part.objects.visible_to(self.user.profile.instrument_groups.all())), [self.horn])
+
+    def test_rebuild_command_restores_table(self):
+        PartGroupMatch.objects.all().delete()
+        call_command("rebuild_part_group_matches", stdout=io.StringIO())
+        self.assertEqual(
+            list(PartGroupMatch.objects.values_list("part_id", "group_id")),
+            [(self.tuba.pk, self.group.pk)],
+        )
+
+
+class DownloadWindowTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        composer = Composer.objects.create(name="Sousa")
+        cls.recent = Piece.objects.create(title="Recent", composer=composer)
+        cls.old = Piece.objects.create(title="Old", composer=composer)
+        cls.unplayed = Piece.objects.create(title="Unplayed", composer=composer)
+        cls.recent_concert = Concert.objects.create(
+            title="Frühjahr", date=timezone.now() - timedelta(days=10)
+        )
+        cls.old_concert = Concert.objects.create(
+            title="Herbst", date=timezone.now() - timedelta(days=40)
+        )
+        ProgramItem.objects.create(concert=cls.recent_concert, piece=cls.recent)
+        ProgramItem.objects.create(concert=cls.old_concert, piece=cls.old)
+
+    def downloadable_titles(self):
+        access = AccessContext(AnonymousUser())
+        with self.assertNumQueries(1):
+            titles = {
+                piece.title
+                for piece in Piece.objects.only("title", "download_open_until")
+                if access.is_piece_downloadable(piece)
+            }
+        self.assertEqual(
+            titles,
+            set(
+                Piece.objects.filter(download_open_until__gte=timezone.localdate())
+                .values_list("title", flat=True)
+            ),
+        )
+        return titles
+
+    def test_window_matches_grace_period(self):
+        self.assertEqual(self.downloadable_titles(), {"Recent"})
+        self.recent.refresh_from_db()
+        self.assertTrue(self.recent.is_active_for_download())
+        self.assertFalse(self.unplayed.is_active_for_download())
+
+    def test_window_follows_concert_and_program_changes(self):
+        self.old_concert.date = timezone.now() + timedelta(days=3)
+        self.old_concert.save()
+        self.assertEqual(self.downloadable_titles(), {"Recent", "Old"})
+
+        self.recent_concert.programitem_set.all().delete()
+        self.assertEqual(self.downloadable_titles(), {"Old"})
+
+        self.old_concert.program.add(self.unplayed, through_defaults={"order": 2})
+        self.assertEqual(self.downloadable_titles(), {"Old", "Unplayed"})
+
+        self.old_concert.delete()
+        self.assertEqual(self.downloadable_titles(), set())
+        self.assertIsNone(Piece.objects.get(pk=self.old.pk).download_open_until)
+
+    @override_settings(SCORELIB_DOWNLOAD_GRACE_DAYS=60)
+    def test_grace_period_is_configurable(self):
+        call_command("rebuild_download_windows", stdout=io.StringIO())
+        self.assertEqual(self.downloadable_titles(), {"Recent", "Old"})
+
+
+class AccessContextTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        composer = Composer.objects.create(name="Reed")
+        cls.piece = Piece.objects.create(title="Festive Overture", composer=composer)
+        concert = Concert.objects.create(
+            title="Sommer", date=timezone.now() + timedelta(days=5)
+        )
+        ProgramItem.objects.create(concert=concert, piece=cls.piece)
+        cls.piece.refresh_from_db()
+        cls.clarinet = Part.objects.create(piece=cls.piece, part_name="Klarinette 1")
+        cls.flute = Part.objects.create(piece=cls.piece, part_name="Flöte")
+        group = InstrumentGroup.objects.create(name="Klarinette", filter_strings="Klarinette*")
+        cls.user = User.objects.create_user(username="clarinet", password="x")
+        cls.user.profile.instrument_groups.set([group])
+
+    def test_profile_and_groups_load_in_one_query(self):
+        access = AccessContext(self.user)
+        with self.assertNumQueries(1):
+            self.assertTrue(access.has_profile)
+            self.assertFalse(access.has_full_access)
+            self.assertTrue(access.can_view_part("Klarinette 2"))
+            self.assertEqual(
+                access.allowed_parts(self.piece, [self.clarinet, self.flute]),
+                [self.clarinet],
+            )
+
+    def test_download_denied_for_foreign_part(self):
+        self.client.force_login(self.user)
+        response = self.client.get(
+            reverse("protected_part_download", args=[self.flute.id])
+        )
+        self.assertEqual(response.status_code, 403)
+
+
+class SignedDownloadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        composer = Composer.objects.create(name="Grieg")
+        piece = Piece.objects.create(title="Morgenstimmung", composer=composer)
+        cls.part = Part.objects.create(piece=piece, part_name="Flöte 1")
+        cls.user = User.objects.create_user(username="flute", password="x")
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp(prefix="scorelib_signed_")
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.part.pdf_file.save("floete.pdf", ContentFile(b"%PDF-1.4 floete"), save=True)
+
+    def test_signed_link_serves_file_without_session_or_queries(self):
+        url = part_download_url(self.part, self.user)
+        self.assertNotEqual(url, reverse("protected_part_download", args=[self.part.id]))
+        with self.assertNumQueries(0), self.assertLogs("scorelib.downloads") as logs:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), b"%PDF-1.4 floete")
+        self.assertEqual(
+            logs.output,
+            [
+                f"INFO:scorelib.downloads:signed part download: {self.part.pdf_file.name} "
+                f"(id {self.part.pk}) for user {self.user.pk} from 127.0.0.1"
+            ],
+        )
+
+    def test_tampered_link_is_rejected(self):
+        url = part_download_url(self.part, self.user)
+        response = self.client.get(url[:-3] + "xx/")
+        self.assertEqual(response.status_code, 403)
+
+    def test_link_is_stable_within_a_bucket(self):
+        start = 1_800_000_000  # a multiple of the one-hour bucket
+        with patch("time.time", return_value=start + 10):
+            url = part_download_url(self.part, self.user)
+        with patch("time.time", return_value=start + 3500):
+            self.assertEqual(part_download_url(self.part, self.user), url)
+            self.assertEqual(self.client.get(url).status_code, 200)
+        with patch("time.time", return_value=start + 3700):
+            self.assertNotEqual(part_download_url(self.part, self.user), url)
+        # still valid for the full max age after it was handed out last
+        with patch("time.time", return_value=start + 3500 + 2 * 60 * 60):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_expired_link_falls_back_to_protected_download(self):
+        url = part_download_url(self.part, self.user)
+        with override_settings(SCORELIB_SIGNED_URL_MAX_AGE=-1, SCORELIB_SIGNED_URL_BUCKET=1):
+            response = self.client.get(url)
+        self.assertRedirects(
+            response,
+            reverse("protected_part_download", args=[self.part.id]),
+            fetch_redirect_response=False,
+        )
+
+    def test_revalidation_returns_304_after_permission_check(self):
+        staff = User.objects.create_user(username="archivar", password="x", is_staff=True)
+        url = reverse("protected_part_download", args=[self.part.id])
+
+        self.client.force_login(staff)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("private", response["Cache-Control"])
+        etag = response["ETag"]
+
+        response = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(response.content, b"")
+
+        response = self.client.get(
+            url, headers={"If-Modified-Since": response["Last-Modified"]}
+        )
+        self.assertEqual(response.status_code, 304)
+
+        # without a profile the validators must not leak anything
+        self.client.force_login(self.user)
+        response = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 403)
+
+
+class FileServingTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp(prefix="scorelib_serving_")
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def write_file(self, rel_path, content):
+        full_path = os.path.join(self.media, rel_path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "wb") as f:
+            f.write(content)
+        return full_path
+
+    @override_settings(SCORELIB_X_ACCEL_REDIRECT=True)
+    def test_accel_redirect_offloads_media_files(self):
+        path = self.write_file("sheet_music/parts/Marsch Nr 1.pdf", b"%PDF")
+        response = serve_protected_file(RequestFactory().get("/"), path, "application/pdf")
+        self.assertEqual(
+            response["X-Accel-Redirect"],
+            "/protected-media/sheet_music/parts/Marsch%20Nr%201.pdf",
+        )
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response["Content-Type"], "application/pdf")
+
+    def test_python_streaming_is_the_fallback(self):
+        path = self.write_file("concerts/audio/track.mp3", b"ID3data")
+        response = serve_protected_file(RequestFactory().get("/"), path, "audio/mpeg")
+        self.assertNotIn("X-Accel-Redirect", response)
+        self.assertEqual(b"".join(response.streaming_content), b"ID3data")
+
+    def get(self, path, **headers):
+        request = RequestFactory().get("/", headers=headers)
+        return serve_protected_file(request, path, "audio/mpeg")
+
+    def test_range_requests_for_various_file_sizes(self):
+        for size in (1, 1000, 200 * 1024):
+            with self.subTest(size=size):
+                data = bytes(i % 251 for i in range(size))
+                path = self.write_file(f"concerts/audio/{size}.mp3", data)
+
+                response = self.get(path, Range="bytes=0-0")
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(response["Content-Range"], f"bytes 0-0/{size}")
+                self.assertEqual(b"".join(response.streaming_content), data[:1])
+
+                response = self.get(path, Range="bytes=-500")
+                self.assertEqual(response.status_code, 206)
+                body = b"".join(response.streaming_content)
+                self.assertEqual(body, data[-500:])
+                self.assertEqual(int(response["Content-Length"]), len(body))
+
+                response = self.get(path, Range=f"bytes={size // 2}-")
+                self.assertEqual(b"".join(response.streaming_content), data[size // 2:])
+                self.assertEqual(response["Accept-Ranges"], "bytes")
+
+    def test_multiple_ranges_are_sent_as_multipart(self):
+        data = bytes(range(200))
+        path = self.write_file("concerts/audio/multi.mp3", data)
+        response = self.get(path, Range="bytes=0-9, 100-109, 5-14")
+        self.assertEqual(response.status_code, 206)
+        self.assertTrue(response["Content-Type"].startswith("multipart/byteranges"))
+        body = b"".join(response.streaming_content)
+        self.assertEqual(int(response["Content-Length"]), len(body))
+        # overlapping ranges are merged
+        self.assertIn(b"Content-Range: bytes 0-14/200\r\n\r\n" + data[0:15], body)
+        self.assertIn(b"Content-Range: bytes 100-109/200\r\n\r\n" + data[100:110], body)
+
+    def test_unsatisfiable_and_malformed_ranges(self):
+        path = self.write_file("concerts/audio/short.mp3", b"0123456789")
+        response = self.get(path, Range="bytes=50-60")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], "bytes */10")
+
+        response = self.get(path, Range="bytes=abc")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), b"0123456789")
+
+    def test_no_range_of_an_empty_file_is_satisfiable(self):
+        path = self.write_file("concerts/audio/empty.mp3", b"")
+        for header in ("bytes=-5", "bytes=0-", "bytes=0-0", "bytes=-5, 0-"):
+            with self.subTest(header=header):
+                self.assertEqual(parse_range_header(header, 0), [])
+                response = self.get(path, Range=header)
+                self.assertEqual(response.status_code, 416)
+                self.assertEqual(response["Content-Range"], "bytes */0")
+
+    def test_if_range_mismatch_returns_full_file(self):
+        path = self.write_file("concerts/audio/changed.mp3", b"0123456789")
+        response = self.get(
+            path, Range="bytes=0-1", If_Range="Wed, 21 Oct 2015 07:28:00 GMT"
+        )
+        self.assertEqual(response.status_code, 200)
+
+        response = self.get(
+            path,
+            Range="bytes=0-1",
+            If_Range=self.get(path)["Last-Modified"],
+        )
+        self.assertEqual(response.status_code, 206)
+
+    def test_stored_hash_is_used_as_etag(self):
+        path = self.write_file("sheet_music/parts/hash.pdf", b"%PDF")
+        request = RequestFactory().get("/", headers={"If-None-Match": '"abc123"'})
+        response = serve_protected_file(request, path, "application/pdf", etag="abc123")
+        self.assertEqual(response.status_code, 304)
+
+        response = serve_protected_file(
+            RequestFactory().get("/"), path, "application/pdf", etag="abc123"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["ETag"], '"abc123"')
+
+    @override_settings(SCORELIB_X_ACCEL_REDIRECT=True)
+    def test_accel_redirect_keeps_the_nginx_etag(self):
+        path = self.write_file("sheet_music/parts/accel.pdf", b"%PDF")
+        response = serve_protected_file(
+            RequestFactory().get("/"), path, "application/pdf", etag="abc123"
+        )
+        nginx_etag = file_etag(os.stat(path))
+        self.assertEqual(response["ETag"], nginx_etag)
+
+        # clients revalidate with the tag nginx sent them
+        request = RequestFactory().get("/", headers={"If-None-Match": nginx_etag})
+        response = serve_protected_file(request, path, "application/pdf", etag="abc123")
+        self.assertEqual(response.status_code, 304)
+        self.assertNotIn("X-Accel-Redirect", response)
+
+    def test_streaming_zip_stores_files_in_small_chunks(self):
+        big = os.urandom(300 * 1024)
+        big_path = self.write_file("sheet_music/parts/big.pdf", big)
+        small_path = self.write_file("sheet_music/parts/small.pdf", b"%PDF small")
+        entries = [
+            (big_path, "a/big.pdf"),
+            (os.path.join(self.media, "missing.pdf"), "a/missing.pdf"),
+            (small_path, "b/small.pdf"),
+        ]
+
+        chunks = list(iter_zip(entries, chunk_size=16 * 1024))
+        self.assertLess(max(len(chunk) for chunk in chunks), 20 * 1024)
+
+        with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as archive:
+            self.assertEqual(archive.namelist(), ["a/big.pdf", "b/small.pdf"])
+            self.assertEqual(archive.read("a/big.pdf"), big)
+            self.assertEqual(archive.getinfo("a/big.pdf").compress_type, zipfile.ZIP_STORED)
+            self.assertIsNone(archive.testzip())
+
+    def test_admin_zip_action_streams_selected_pieces(self):
+        composer = Composer.objects.create(name="Norbert Gälle")
+        piece = Piece.objects.create(title="Böhmischer Traum", composer=composer)
+        part = Part.objects.create(piece=piece, part_name="Tenorhorn 1")
+        part.pdf_file.save("tenorhorn.pdf", ContentFile(b"%PDF tenor"), save=True)
+
+        response = download_parts_as_zip(
+            None, RequestFactory().get("/"), Piece.objects.filter(pk=piece.pk)
+        )
+        self.assertTrue(response.streaming)
+        with zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content))) as archive:
+            self.assertEqual(
+                archive.namelist(),
+                ["Böhmischer_Traum/Böhmischer_Traum_Tenorhorn_1.pdf"],
+            )
+
+
+class ConcertBundleTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp(prefix="scorelib_bundle_")
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(
+            MEDIA_ROOT=self.media, SCORELIB_CACHE_DIR=os.path.join(self.media, "cache")
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+
+        composer = Composer.objects.create(name="Sousa")
+        self.concert = Concert.objects.create(
+            title="Frühjahrskonzert", date=timezone.now() + timedelta(days=3)
+        )
+        self.parts = []
+        for order, title in enumerate(["Liberty Bell", "El Capitan"]):
+            piece = Piece.objects.create(title=title, composer=composer)
+            ProgramItem.objects.create(concert=self.concert, piece=piece, order=order)
+            for part_name in ("Trompete 1", "Posaune"):
+                part = Part.objects.create(piece=piece, part_name=part_name)
+                part.pdf_file.save("stimme.pdf", ContentFile(blank_pdf()))
+                self.parts.append(part)
+
+        self.group = group = InstrumentGroup.objects.create(
+            name="Trompeten", filter_strings="Trompete*"
+        )
+        self.users = []
+        for username in ("trp1", "trp2"):
+            user = User.objects.create_user(username=username, password="x")
+            user.profile.instrument_groups.set([group])
+            self.users.append(user)
+        self.url = reverse("concert_bundle_download", args=[self.concert.id])
+
+    def download(self, user):
+        self.client.force_login(user)
+        return self.client.get(self.url)
+
+    def bundle_files(self):
+        return os.listdir(os.path.join(self.media, "cache", "bundles"))
+
+    def test_bundle_contains_permitted_parts_in_program_order(self):
+        response = self.download(self.users[0])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("attachment", response["Content-Disposition"])
+        with zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content))) as archive:
+            self.assertEqual(
+                archive.namelist(),
+                ["01_Liberty_Bell/Trompete_1.pdf", "02_El_Capitan/Trompete_1.pdf"],
+            )
+
+    def test_section_shares_one_bundle_until_parts_change(self):
+        self.download(self.users[0])
+        self.download(self.users[1])
+        self.assertEqual(len(self.bundle_files()), 1)
+        first = self.bundle_files()[0]
+
+        self.parts[0].pdf_file.save("neu.pdf", ContentFile(b"%PDF neu"))
+        self.download(self.users[1])
+        self.assertEqual(len(self.bundle_files()), 1)
+        self.assertNotEqual(self.bundle_files()[0], first)
+
+    def test_no_bundle_without_parts(self):
+        user = User.objects.create_user(username="gast", password="x")
+        self.assertEqual(self.download(user).status_code, 403)
+
+    def test_concert_folder_pdf_with_bookmarks_and_metadata(self):
+        self.client.force_login(self.users[0])
+        url = reverse("concert_folder_download", args=[self.concert.id, self.group.id])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        reader = PdfReader(io.BytesIO(b"".join(response.streaming_content)))
+        self.assertEqual(len(reader.pages), 2)
+        self.assertEqual(
+            [item.title for item in reader.outline], ["1. Liberty Bell", "2. El Capitan"]
+        )
+        self.assertEqual(reader.metadata.title, "Frühjahrskonzert (Trompeten)")
+        self.assertEqual(reader.metadata.author, "Sousa")
+
+        other = InstrumentGroup.objects.create(name="Posaunen", filter_strings="Posaune*")
+        url = reverse("concert_folder_download", args=[self.concert.id, other.id])
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+    def test_concert_folder_is_rebuilt_when_program_order_changes(self):
+        first = get_concert_folder_pdf(self.concert, self.group)
+        self.assertEqual(get_concert_folder_pdf(self.concert, self.group), first)
+
+        ProgramItem.objects.filter(concert=self.concert, order=0).update(order=5)
+        second = get_concert_folder_pdf(self.concert, self.group)
+        self.assertNotEqual(second, first)
+        self.assertFalse(os.path.exists(first))
+        self.assertEqual(
+            [item.title for item in PdfReader(second).outline],
+            ["1. El Capitan", "2. Liberty Bell"],
+        )
+
+
+class FingerprintTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp(prefix="scorelib_fingerprint_")
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        composer = Composer.objects.create(name="Fucik")
+        self.piece = Piece.objects.create(title="Florentiner Marsch", composer=composer)
+
+    def test_fingerprint_is_filled_on_save_and_follows_file_changes(self):
+        content = blank_pdf(pages=3)
+        part = Part.objects.create(piece=self.piece, part_name="Flügelhorn")
+        part.pdf_file.save("fluegelhorn.pdf", ContentFile(content))
+
+        part.refresh_from_db()
+        self.assertEqual(part.file_size, len(content))
+        self.assertEqual(part.sha256, hashlib.sha256(content).hexdigest())
+        self.assertEqual(part.page_count, 3)
+        self.assertIsNotNone(part.file_mtime)
+
+        part.pdf_file.save("fluegelhorn_neu.pdf", ContentFile(blank_pdf(pages=1)))
+        part.refresh_from_db()
+        self.assertEqual(part.page_count, 1)
+
+    def test_backfill_command_only_touches_stale_rows(self):
+        part = Part.objects.create(piece=self.piece, part_name="Tuba")
+        part.pdf_file.save("tuba.pdf", ContentFile(blank_pdf(pages=2)))
+        Part.objects.filter(pk=part.pk).update(file_size=None, sha256="", page_count=None)
+
+        out = io.StringIO()
+        call_command("update_file_fingerprints", "--workers", "2", stdout=out)
+        part.refresh_from_db()
+        self.assertEqual(part.page_count, 2)
+        self.assertIn("1 fingerprints updated", out.getvalue())
+
+        out = io.StringIO()
+        call_command("update_file_fingerprints", stdout=out)
+        self.assertIn("0 fingerprints updated", out.getvalue())
+
+
+class DedupStorageTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp(prefix="scorelib_dedup_")
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media, SCORELIB_DEDUP_STORAGE=True)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.storage = DedupFileSystemStorage()
+
+    def test_identical_files_share_one_blob_until_collected(self):
+        first = self.storage.save("sheet_music/parts/a.pdf", ContentFile(b"%PDF same"))
+        second = self.storage.save("sheet_music/parts/b.pdf", ContentFile(b"%PDF same"))
+        self.assertTrue(os.path.samefile(self.storage.path(first), self.storage.path(second)))
+        self.assertEqual(self.storage.open(second).read(), b"%PDF same")
+
+        self.storage.delete(first)
+        self.assertEqual(self.storage.collect_garbage(min_age=0), (0, 0))
+        self.storage.delete(second)
+        self.assertEqual(self.storage.collect_garbage(min_age=0), (1, 9))
+        self.assertEqual(self.storage.collect_garbage(min_age=0), (0, 0))
+
+    def test_command_converts_existing_tree_in_place(self):
+        composer = Composer.objects.create(name="Teike")
+        piece = Piece.objects.create(title="Alte Kameraden", composer=composer)
+        paths = []
+        for name in ("direktion.pdf", "direktion_kopie.pdf"):
+            path = os.path.join(self.media, "sheet_music", "parts", name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(b"%PDF direktion")
+            Part.objects.create(
+                piece=piece, part_name="Direktion", pdf_file=f"sheet_music/parts/{name}"
+            )
+            paths.append(path)
+        self.assertFalse(os.path.samefile(*paths))
+
+        out = io.StringIO()
+        call_command("dedup_part_files", stdout=out)
+        self.assertTrue(os.path.samefile(*paths))
+        self.assertIn("2 part files checked", out.getvalue())
+        with open(paths[1], "rb") as f:
+            self.assertEqual(f.read(), b"%PDF direktion")
+
+
+class ShardedUploadTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp(prefix="scorelib_shard_")
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        composer = Composer.objects.create(name="Blankenburg")
+        self.piece = Piece.objects.create(title="Abschied der Gladiatoren", composer=composer)
+        self.user = User.objects.create_user(username="shard", password="x")
+
+    def test_new_uploads_are_sharded_when_enabled(self):
+        part = Part.objects.create(piece=self.piece, part_name="Horn")
+        part.pdf_file.save("horn.pdf", ContentFile(b"%PDF horn"))
+        self.assertEqual(part.pdf_file.name, "sheet_music/parts/horn.pdf")
+
+        with override_settings(SCORELIB_SHARDED_UPLOADS=True):
+            part.pdf_file.save("horn2.pdf", ContentFile(b"%PDF horn"))
+        self.assertRegex(
+            part.pdf_file.name, r"^sheet_music/parts/[0-9a-f]{2}/[0-9a-f]{2}/horn2\.pdf$"
+        )
+
+    def test_command_moves_files_and_can_be_rerun(self):
+        part = Part.objects.create(piece=self.piece, part_name="Bariton")
+        part.pdf_file.save("bariton.pdf", ContentFile(b"%PDF bariton"))
+        old_url = part_download_url(part, self.user)
+
+        with override_settings(SCORELIB_SHARDED_UPLOADS=True):
+            out = io.StringIO()
+            call_command("shard_media_files", "--batch-size", "1", stdout=out)
+            self.assertIn("1 files moved", out.getvalue())
+
+            part.refresh_from_db()
+            self.assertRegex(part.pdf_file.name, r"^sheet_music/parts/../../bariton\.pdf$")
+            self.assertTrue(os.path.exists(part.pdf_file.path))
+
+            out = io.StringIO()
+            call_command("shard_media_files", stdout=out)
+            self.assertIn("0 files moved", out.getvalue())
+
+        # links issued before the move fall back to the checked download
+        response = self.client.get(old_url)
+        self.assertRedirects(
+            response,
+            reverse("protected_part_download", args=[part.id]),
+            fetch_redirect_response=False,
+        )
+
+
+@override_settings(SCORELIB_SEARCH_BACKEND="scorelib.search_backends.DatabaseSearchBackend")
+class SearchIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.composer = Composer.objects.create(name="Antonín Dvořák")
+        cls.arranger = Arranger.objects.create(name="Siegfried Rundel")
+        publisher = Publisher.objects.create(name="Rundel Verlag")
+        cls.piece = Piece.objects.create(
+            title="Slawischer Tanz Nr. 8",
+            composer=cls.composer,
+            arranger=cls.arranger,
+            publisher=publisher,
+            archive_label="K-117",
+        )
+        Piece.objects.create(title="Radetzky-Marsch", composer=cls.composer)
+
+    def search(self, query):
+        return list(filter_pieces(Piece.objects.all(), query).values_list("title", flat=True))
+
+    @skipUnless(connection.vendor == "sqlite", "the FTS5 index is SQLite only")
+    def test_prefix_and_diacritic_insensitive_matching(self):
+        self.assertTrue(fts_available())
+        self.assertEqual(self.search("slaw tan"), ["Slawischer Tanz Nr. 8"])
+        self.assertEqual(self.search("dvorak radetz"), ["Radetzky-Marsch"])
+        self.assertEqual(self.search("rundel verlag"), ["Slawischer Tanz Nr. 8"])
+        self.assertEqual(self.search("k-117"), ["Slawischer Tanz Nr. 8"])
+        self.assertEqual(self.search("?!"), [])
+
+    def test_index_follows_renames_and_deletions(self):
+        self.composer.name = "Antonin Leopold Dvorak"
+        self.composer.save()
+        self.assertEqual(len(self.search("leopold")), 2)
+
+        self.arranger.delete()
+        self.assertEqual(self.search("siegfried"), [])
+
+        self.piece.delete()
+        self.assertEqual(self.search("slawischer"), [])
+
+    def test_search_keys_are_normalized(self):
+        self.assertEqual(normalize_search_text("  Straße  Ærø "), "strasse aero")
+        self.assertEqual(self.composer.search_key, "antonin dvorak")
+        piece = Piece.objects.create(title="Großer Zapfenstreich", composer=self.composer)
+        self.assertEqual(self.search("grosser zapfen"), ["Großer Zapfenstreich"])
+        self.assertEqual(self.search("GROSSER"), [piece.title])
+
+    def test_rebuild_search_keys_backfills(self):
+        Composer.objects.filter(pk=self.composer.pk).update(search_key="")
+        call_command("rebuild_search_keys", stdout=io.StringIO())
+        self.composer.refresh_from_db()
+        self.assertEqual(self.composer.search_key, "antonin dvorak")
+        self.assertEqual(len(self.search("dvorak")), 2)
+
+    def test_orm_fallback_uses_search_keys(self):
+        with patch("scorelib.search_index.fts_available", return_value=False):
+            self.assertEqual(self.search("dvorak slaw"), [])
+            self.assertEqual(len(self.search("dvorak")), 2)
+            self.assertEqual(self.search("slawischer"), ["Slawischer Tanz Nr. 8"])
+
+    def test_backend_is_chosen_in_settings(self):
+        with override_settings(
+            SCORELIB_SEARCH_BACKEND="scorelib.search_backends.PostgresSearchBackend"
+        ):
+            self.assertIsInstance(get_search_backend(), PostgresSearchBackend)
+            # not on PostgreSQL: falls back to the default search
+            results = search_pieces(Piece.objects.all(), "slaw")
+            self.assertEqual([p.title for p in results], ["Slawischer Tanz Nr. 8"])
+        self.assertNotIsInstance(get_search_backend(), PostgresSearchBackend)
+
+    def test_admin_search_uses_backend(self):
+        admin = User.objects.create_superuser(username="admin", password="x")
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse("admin:scorelib_piece_changelist"), {"q": "dvorak radetz"}
+        )
+        self.assertEqual(
+            [p.title for p in response.context["cl"].result_list], ["Radetzky-Marsch"]
+        )
+
+    def test_merges_reindex_the_moved_pieces(self):
+        admin = User.objects.create_superuser(username="admin", password="x")
+        self.client.force_login(admin)
+        duplicate = Composer.objects.create(name="Anton Dworschak")
+        humoreske = Piece.objects.create(title="Humoreske", composer=duplicate)
+        self.assertEqual(self.search("dworschak"), ["Humoreske"])
+
+        version = get_search_version()
+        self.client.post(
+            reverse("admin:scorelib_composer_changelist"),
+            {
+                "action": "merge_composers_action",
+                "_selected_action": [self.composer.pk, duplicate.pk],
+                "apply": "1",
+                "master_id": self.composer.pk,
+            },
+        )
+        self.assertFalse(Composer.objects.filter(pk=duplicate.pk).exists())
+        self.assertEqual(self.search("dworschak"), [])
+        self.assertIn("Humoreske", self.search("dvorak"))
+        self.assertLessEqual(
+            trigrams("dvorak"), set(humoreske.trigrams.values_list("trigram", flat=True))
+        )
+        self.assertNotEqual(get_search_version(), version)
+
+        # the same through the duplicate suggestions
+        duplicate = Arranger.objects.create(name="S. Rundl")
+        Piece.objects.create(title="Polka", composer=self.composer, arranger=duplicate)
+        session = self.client.session
+        session["duplicate_clusters"] = [
+            {"entries": [{"id": self.arranger.pk}, {"id": duplicate.pk}]}
+        ]
+        session.save()
+        self.client.post(
+            reverse("merge_cluster_confirm", args=["arranger"]),
+            {"cluster_index": 0, "master_id": self.arranger.pk, "merge_ids": [duplicate.pk]},
+        )
+        self.assertIn("Polka", self.search("siegfried"))
+        self.assertEqual(self.search("rundl"), [])
+
+    def test_live_search_uses_index(self):
+        user = User.objects.create_user(username="suche", password="x")
+        self.client.force_login(user)
+        response = self.client.get(reverse("scorelib_api_search"), {"q": "radetz"})
+        self.assertEqual(
+            [result["title"] for result in response.json()["results"]], ["Radetzky-Marsch"]
+        )
+
+
+@override_settings(SCORELIB_SEARCH_BACKEND="scorelib.search_backends.DatabaseSearchBackend")
+class FuzzySearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tschaikowsky = Composer.objects.create(name="Peter Tschaikowsky")
+        cls.nutcracker = Piece.objects.create(
+            title="Nussknacker-Suite", composer=cls.tschaikowsky
+        )
+        bernstein = Composer.objects.create(name="Leonard Bernstein")
+        Piece.objects.create(title="West Side Story", composer=bernstein)
+        Piece.objects.create(title="Candide Ouvertüre", composer=bernstein)
+
+    def search(self, query):
+        return [p.title for p in search_pieces(Piece.objects.all(), query)]
+
+    def test_trigrams(self):
+        self.assertEqual(trigrams("Bach"), {"  b", " ba", "bac", "ach", "ch "})
+        self.assertEqual(trigrams("?!"), set())
+
+    def test_misspelled_names_and_titles(self):
+        self.assertEqual(self.search("Tchaikowsky"), ["Nussknacker-Suite"])
+        self.assertEqual(
+            sorted(self.search("Bernstien")), ["Candide Ouvertüre", "West Side Story"]
+        )
+        self.assertEqual(self.search("nusknacker"), ["Nussknacker-Suite"])
+        self.assertEqual(self.search("Mozart"), [])
+
+    def test_fuzzy_only_when_few_exact_results(self):
+        with override_settings(SCORELIB_FUZZY_MIN_RESULTS=1):
+            # "west" is found exactly, the similar "ouvertüre" is not added
+            self.assertEqual(self.search("west"), ["West Side Story"])
+        with override_settings(SCORELIB_FUZZY_MIN_RESULTS=0):
+            self.assertEqual(self.search("Tchaikowsky"), [])
+
+    def test_index_is_updated_incrementally(self):
+        self.tschaikowsky.name = "Pjotr Iljitsch Tschaikowski"
+        self.tschaikowsky.save()
+        self.assertIn(self.nutcracker.pk, fuzzy_piece_ids("iljitch"))
+
+        before = set(self.nutcracker.trigrams.values_list("pk", flat=True))
+        self.nutcracker.save()
+        self.assertEqual(set(self.nutcracker.trigrams.values_list("pk", flat=True)), before)
+
+        pk = self.nutcracker.pk
+        self.nutcracker.delete()
+        self.assertFalse(PieceTrigram.objects.filter(piece_id=pk).exists())
+
+    def test_rebuild_command(self):
+        PieceTrigram.objects.all().delete()
+        call_command("rebuild_piece_trigrams", stdout=io.StringIO())
+        self.assertEqual(self.search("Tchaikowsky"), ["Nussknacker-Suite"])
+
+
+class SearchCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        composer = Composer.objects.create(name="Julius Fučík")
+        cls.piece = Piece.objects.create(title="Florentiner Marsch", composer=composer)
+        cls.part = Part.objects.create(
+            piece=cls.piece, part_name="Trompete 1", pdf_file="parts/trp1.pdf"
+        )
+        cls.brass = InstrumentGroup.objects.create(name="Blech", filter_strings="Trompete")
+        cls.user = User.objects.create_user(username="trompete", password="x")
+        cls.user.profile.instrument_groups.add(cls.brass)
+        cls.admin = User.objects.create_user(username="archiv", password="x", is_staff=True)
+
+    def setUp(self):
+        bump_search_version()
+
+    def search(self, user, query):
+        self.client.force_login(user)
+        return self.client.get(reverse("scorelib_api_search"), {"q": query}).json()["results"]
+
+    def test_lru_eviction(self):
+        cache = LRUCache(2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.set("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(
+            cache.stats(),
+            {"size": 2, "max_size": 2, "hits": 1, "misses": 1, "evictions": 1, "hit_rate": 0.5},
+        )
+
+    def test_lru_validate_clears_on_new_version(self):
+        cache = LRUCache(2)
+        cache.validate("v1")
+        cache.set("a", 1)
+        cache.validate("v1")
+        self.assertEqual(cache.get("a"), 1)
+        cache.validate("v2")
+        self.assertIsNone(cache.get("a"))
+
+    def test_hits_per_normalized_query_and_scope(self):
+        cache = get_search_cache()
+        hits = cache.hits
+        self.search(self.admin, "florentiner")
+        self.search(self.admin, "  FLORENTINER ")
+        self.assertEqual(cache.hits, hits + 1)
+
+        # other scope: the musician's piece is not downloadable, so no parts
+        [result] = self.search(self.user, "florentiner")
+        self.assertEqual(result["parts"], [])
+        [result] = self.search(self.admin, "florentiner")
+        self.assertEqual([part["name"] for part in result["parts"]], ["Trompete 1"])
+
+    def test_links_are_signed_per_user(self):
+        other = User.objects.create_user(username="archiv2", password="x", is_staff=True)
+        url = self.search(self.admin, "florentiner")[0]["parts"][0]["url"]
+        self.assertNotEqual(self.search(other, "florentiner")[0]["parts"][0]["url"], url)
+
+    def test_changes_invalidate(self):
+        self.assertEqual(len(self.search(self.admin, "florentiner")), 1)
+        self.piece.title = "Bayerischer Defiliermarsch"
+        self.piece.save()
+        self.assertEqual(self.search(self.admin, "florentiner"), [])
+
+        self.assertEqual(len(self.search(self.admin, "bayerischer")[0]["parts"]), 1)
+        self.part.delete()
+        self.assertEqual(self.search(self.admin, "bayerischer")[0]["parts"], [])
+
+    def test_rebuild_commands_invalidate(self):
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        Piece.objects.filter(pk=self.piece.pk).update(download_open_until=tomorrow)
+        self.brass.filter_strings = "Trompete*"
+        self.brass.save()
+        PartGroupMatch.objects.all().delete()
+        bump_search_version()
+        self.assertEqual(self.search(self.user, "florentiner")[0]["parts"], [])
+
+        call_command("rebuild_part_group_matches", stdout=io.StringIO())
+        [result] = self.search(self.user, "florentiner")
+        self.assertEqual([part["name"] for part in result["parts"]], ["Trompete 1"])
+
+        # no concert: the rebuilt window is closed again
+        call_command("rebuild_download_windows", stdout=io.StringIO())
+        self.assertEqual(self.search(self.user, "florentiner")[0]["parts"], [])
+
+    def test_genre_changes_invalidate(self):
+        version = get_search_version()
+        genre = Genre.objects.create(name="Marsch")
+        self.piece.genres.add(genre)
+        self.assertNotEqual(get_search_version(), version)
+
+    def test_stats_endpoint_is_staff_only(self):
+        self.search(self.admin, "florentiner")
+        response = self.client.get(reverse("scorelib_api_search_cache_stats"))
+        self.assertTrue(response.json()["enabled"])
+        self.assertIn("hit_rate", response.json())
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("scorelib_api_search_cache_stats"))
+        self.assertEqual(response.status_code, 403)
+
+
+class TypeaheadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        dvorak = Composer.objects.create(name="Antonín Dvořák")
+        strauss = Composer.objects.create(name="Johann Strauß")
+        Composer.objects.create(name="Johannes Brahms")
+        march = Genre.objects.create(name="Marsch")
+        for title in ("Radetzky-Marsch", "Kaiserwalzer"):
+            piece = Piece.objects.create(title=title, composer=strauss)
+            piece.genres.add(march)
+        humoreske = Piece.objects.create(title="Humoreske", composer=dvorak)
+        cls.new_year = Concert.objects.create(
+            title="Neujahrskonzert", date=timezone.make_aware(datetime(2025, 1, 1, 17))
+        )
+        Concert.objects.create(title="Neujahrsempfang")
+        for piece in Piece.objects.filter(composer=strauss):
+            ProgramItem.objects.create(concert=cls.new_year, piece=piece)
+        ProgramItem.objects.create(
+            concert=Concert.objects.create(title="Frühjahrskonzert 2024"), piece=humoreske
+        )
+        cls.user = User.objects.create_user(username="tippen", password="x")
+
+    def typeahead(self, kind, query=""):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("scorelib_api_typeahead", args=[kind]), {"q": query})
+        return [(row["name"], row["count"]) for row in response.json()["results"]]
+
+    def test_prefix_matches_with_piece_counts(self):
+        self.assertEqual(
+            self.typeahead("composer", "JOH"), [("Johann Strauß", 2), ("Johannes Brahms", 0)]
+        )
+        self.assertEqual(self.typeahead("composer", "johann strauss"), [("Johann Strauß", 2)])
+        self.assertEqual(self.typeahead("composer", "dvor"), [("Antonín Dvořák", 1)])
+        self.assertEqual(self.typeahead("genre", "mar"), [("Marsch", 2)])
+        self.assertEqual(self.typeahead("composer")[0], ("Johann Strauß", 2))
+
+    def test_concerts_newest_first_with_year(self):
+        self.assertEqual(
+            self.typeahead("concert", "neujahr"),
+            [("Neujahrskonzert (2025)", 2), ("Neujahrsempfang", 0)],
+        )
+        self.assertEqual(self.typeahead("concert", "FRUHJAHR"), [("Frühjahrskonzert 2024", 1)])
+        self.assertEqual(self.typeahead("concert", "2024"), [("Frühjahrskonzert 2024", 1)])
+
+    def test_unknown_kind(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("scorelib_api_typeahead", args=["venue"]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_archive_page_renders_only_selected_names(self):
+        self.client.force_login(self.user)
+        brahms = Composer.objects.get(name="Johannes Brahms")
+        response = self.client.get(reverse("scorelib_index"), {"composer": brahms.pk})
+        self.assertContains(response, f'<option value="{brahms.pk}" selected>Johannes Brahms</option>')
+        self.assertNotContains(response, "Antonín Dvořák</option>")
+
+        response = self.client.get(reverse("scorelib_index"), {"concert": self.new_year.pk})
+        self.assertContains(
+            response, f'<option value="{self.new_year.pk}" selected>Neujahrskonzert (2025)</option>'
+        )
+        self.assertNotContains(response, "Frühjahrskonzert 2024</option>")
+
+
+class PartNameSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        composer = Composer.objects.create(name="Gustav Holst")
+        cls.suite = Piece.objects.create(title="First Suite in Es", composer=composer)
+        cls.march = Piece.objects.create(title="A Moorside March", composer=composer)
+        for piece, names in (
+            (cls.suite, ["Tuba 1", "Tuba 2", "Bass in B", "Trompete 1"]),
+            (cls.march, ["Tuba 2", "1. Trompete in B"]),
+        ):
+            for name in names:
+                Part.objects.create(piece=piece, part_name=name, pdf_file=f"parts/{name}.pdf")
+        cls.librarian = User.objects.create_user(username="bib", password="x", is_staff=True)
+
+    def search(self, query, **params):
+        self.client.force_login(self.librarian)
+        return self.client.get(reverse("scorelib_api_part_search"), {"q": query, **params}).json()
+
+    def test_part_key_follows_name(self):
+        part = Part.objects.get(piece=self.suite, part_name="Bass in B")
+        self.assertEqual(part.part_key, "bass in b")
+        part.part_name = " Tuba 3 "
+        part.save(update_fields=["part_name"])
+        part.refresh_from_db()
+        self.assertEqual(part.part_key, "tuba 3")
+
+    def test_wildcards_match_like_instrument_groups(self):
+        patterns = ["tuba 2", "Tuba*", "*in b", "tuba ?", "[!t]*", "*trompete*, bass*", "tuba [2-3]"]
+        names = list(Part.objects.values_list("part_name", flat=True))
+        for pattern in patterns:
+            matcher = compile_filter_strings(pattern)
+            expected = sorted(n for n in names if part_name_matches(matcher, n))
+            found = sorted(
+                part["name"]
+                for result in self.search(pattern)["results"]
+                for part in result["parts"]
+            )
+            self.assertEqual(found, expected, pattern)
+
+    def test_paginated_by_piece_in_one_query(self):
+        search_parts("tuba*")  # count the pieces once
+        with self.assertNumQueries(1):
+            page = search_parts("tuba*", per_page=1)
+        self.assertEqual([piece.title for piece, _ in page.results], ["A Moorside March"])
+        self.assertEqual((page.count, page.num_pages, page.has_next), (2, 2, True))
+
+        # the parts of a piece are never split across pages
+        page = search_parts("tuba*", page=2, per_page=1)
+        self.assertEqual(
+            [(piece.title, [part.part_name for part in parts]) for piece, parts in page.results],
+            [("First Suite in Es", ["Tuba 1", "Tuba 2"])],
+        )
+        self.assertFalse(page.has_next)
+
+        data = self.search("tuba*")
+        self.assertEqual(data["count"], 2)
+        self.assertEqual(
+            [(r["piece"]["title"], [p["name"] for p in r["parts"]]) for r in data["results"]],
+            [("A Moorside March", ["Tuba 2"]), ("First Suite in Es", ["Tuba 1", "Tuba 2"])],
+        )
+        self.assertEqual(self.search("tuba*", page="x")["page"], 1)
+
+    def test_reversed_ranges_match_nothing(self):
+        self.assertEqual(wildcard_regex("tuba [3-1]"), None)
+        self.assertEqual(wildcard_regex("[^-1]"), None)
+        self.assertEqual(wildcard_regex("[!z-a]*"), "^..*$")
+        self.assertEqual(wildcard_regex("[1-]"), "^[1\\-]$")
+        self.assertEqual(self.search("[z-a], tuba 1")["count"], 1)
+        self.librarian.is_superuser = True
+        self.librarian.save()
+        response = self.client.get(reverse("admin:scorelib_part_changelist"), {"q": "[z-a]*"})
+        self.assertEqual(response.context["cl"].result_count, 0)
+
+    def test_wildcards_agree_with_fnmatch(self):
+        names = ["", "a", "b", "z", "-", "!", "^", "]", "[", "\\", "&", "a-b", "1"]
+        alphabet = "ab-z!^]\\[&*?1"
+        rnd = random.Random(7)
+        for _ in range(2000):
+            pattern = "".join(rnd.choice(alphabet) for _ in range(rnd.randint(1, 6)))
+            expected = [fnmatch.fnmatchcase(name, pattern) for name in names]
+            regex = wildcard_regex(pattern)
+            found = [regex is not None and re.search(regex, name) is not None for name in names]
+            self.assertEqual(found, expected, pattern)
+
+    def test_only_for_full_access(self):
+        musician = User.objects.create_user(username="tubist", password="x")
+        self.client.force_login(musician)
+        response = self.client.get(reverse("scorelib_api_part_search"), {"q": "tuba*"})
+        self.assertEqual(response.status_code, 403)
+
+    def test_admin_view(self):
+        self.librarian.is_superuser = True
+        self.librarian.save()
+        self.client.force_login(self.librarian)
+        response = self.client.get(reverse("admin:part-name-search"), {"q": "Tuba 2"})
+        self.assertEqual(response.context["page_obj"].count, 2)
+        self.assertContains(response, "First Suite in Es")
+        response = self.client.get(reverse("admin:scorelib_part_changelist"), {"q": "*in b"})
+        self.assertEqual(response.context["cl"].result_count, 2)
+
+
+class SearchRankingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        composer = Composer.objects.create(name="Carl Teike")
+        marsch = Composer.objects.create(name="Heinrich Marschner")
+        for title, info in (
+            ("Konzertstück", "Trio: Marsch der Freundschaft"),
+            ("Festlicher Marsch", ""),
+            ("Marsch", ""),
+            ("Marschmusik am Abend", ""),
+        ):
+            Piece.objects.create(title=title, composer=composer, additional_info=info)
+        Piece.objects.create(title="Der Vampyr", composer=marsch)
+        cls.user = User.objects.create_user(username="rang", password="x", is_staff=True)
+
+    def live_search(self, query):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("scorelib_api_search"), {"q": query})
+        return [result["title"] for result in response.json()["results"]]
+
+    def test_exact_before_prefix_before_substring(self):
+        self.assertEqual(
+            self.live_search("marsch"),
+            [
+                "Marsch",
+                "Marschmusik am Abend",
+                "Festlicher Marsch",
+                "Der Vampyr",
+                "Konzertstück",
+            ],
+        )
+
+    def test_recent_concerts_rank_higher(self):
+        composer = Composer.objects.get(name="Carl Teike")
+        Piece.objects.create(title="Abendlied", composer=composer)
+        ruhe = Piece.objects.create(title="Abendruhe", composer=composer)
+
+        def ranked():
+            return [p.title for p in rank_pieces(search_pieces(Piece.objects.all(), "abend"), "abend")]
+
+        self.assertEqual(ranked(), ["Abendlied", "Abendruhe", "Marschmusik am Abend"])
+        concert = Concert.objects.create(title="Frühjahrskonzert", date=timezone.now())
+        ProgramItem.objects.create(concert=concert, piece=ruhe, order=1)
+        self.assertEqual(ranked(), ["Abendruhe", "Abendlied", "Marschmusik am Abend"])
+
+    def test_archive_page_sorts_by_relevance_when_searching(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("scorelib_index"), {"search": "marsch"})
+        self.assertEqual(response.context["pieces"][0].title, "Marsch")
+        response = self.client.get(reverse("scorelib_index"), {"search": "marsch", "sort": "title"})
+        self.assertEqual(response.context["pieces"][0].title, "Der Vampyr")
+
+
+@override_settings(SCORELIB_SEARCH_CACHE_SIZE=0)
+class LiveSearchQueryCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.brass = InstrumentGroup.objects.create(name="Blech", filter_strings="Trompete*")
+        cls.musician = User.objects.create_user(username="blech", password="x")
+        cls.musician.profile.instrument_groups.add(cls.brass)
+        cls.staff = User.objects.create_user(username="noten", password="x", is_staff=True)
+
+    def create_pieces(self, count):
+        start = Piece.objects.count()
+        for i in range(start, start + count):
+            composer = Composer.objects.create(name=f"Komponist {i}")
+            piece = Piece.objects.create(title=f"Marsch Nr. {i}", composer=composer)
+            Piece.objects.filter(pk=piece.pk).update(
+                download_open_until=timezone.localdate() + timedelta(days=7)
+            )
+            for name in ("Trompete 1", "Trompete 2", "Flöte"):
+                Part.objects.create(piece=piece, part_name=name, pdf_file=f"parts/{i}-{name}.pdf")
+
+    def assert_search_queries(self, user, expected, pieces, parts_per_piece):
+        self.client.force_login(user)
+        # session, user, fuzzy check, (profile,) pieces with composers, parts
+        with self.assertNumQueries(expected):
+            response = self.client.get(reverse("scorelib_api_search"), {"q": "marsch"})
+        results = response.json()["results"]
+        self.assertEqual(len(results), pieces)
+        self.assertEqual({len(result["parts"]) for result in results}, {parts_per_piece})
+
+    def test_query_count_does_not_grow_with_results(self):
+        for count, total in ((3, 3), (17, 20)):
+            self.create_pieces(count)
+            self.assert_search_queries(self.musician, 6, total, 2)
+            self.assert_search_queries(self.staff, 5, total, 3)
+
+    def test_closed_download_window_hides_parts(self):
+        self.create_pieces(3)
+        Piece.objects.update(download_open_until=timezone.localdate() - timedelta(days=1))
+        self.assert_search_queries(self.musician, 6, 3, 0)
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="noten", password="x", is_staff=True)
+        composers = [Composer.objects.create(name=f"Komponist {i}") for i in range(4)]
+        arrangers = [Arranger.objects.create(name=f"Arrangeur {i}") for i in range(3)]
+        # duplicate titles and missing arrangers/publishers exercise the ties
+        # and NULLs in the sort keys
+        Piece.objects.bulk_create(
+            Piece(
+                title=f"Stück {i % 40:02d}",
+                composer=composers[i % 4],
+                arranger=arrangers[i % 3] if i % 5 else None,
+                difficulty=(i % 6) + 1 if i % 7 else None,
+            )
+            for i in range(120)
+        )
+        call_command("rebuild_search_keys", stdout=io.StringIO())
+        call_command("rebuild_search_index", stdout=io.StringIO())
+        bump_search_version()
+
+    def setUp(self):
+        bump_search_version()
+        self.client.force_login(self.user)
+
+    def walk(self, params, cursor=None, key="previous_cursor"):
+        """Follow the page links from `cursor`; returns the pages' pk lists."""
+        pages = []
+        while True:
+            query = dict(params, cursor=cursor) if cursor else params
+            page = self.client.get(reverse("scorelib_index"), query).context["page_obj"]
+            pages.append([piece.pk for piece in page.object_list])
+            cursor = getattr(page, key)
+            if cursor is None:
+                return pages
+
+    def test_forward_and_backward_visit_every_piece_once(self):
+        all_pks = sorted(Piece.objects.values_list("pk", flat=True))
+        for params in (
+            {"sort": "title"},
+            {"sort": "title", "sort_dir": "desc"},
+            {"sort": "composer", "sort_artist": "arranger"},
+            {"sort": "difficulty", "sort_dir": "desc"},
+            {"sort": "publisher"},
+            {"search": "stück"},
+        ):
+            with self.subTest(**params):
+                forward = self.walk(params, key="next_cursor")
+                self.assertEqual([len(pks) for pks in forward], [50, 50, 20])
+                flat = sum(forward, [])
+                self.assertEqual(sorted(flat), all_pks)
+
+                backward = self.walk(params, cursor="last")
+                self.assertEqual(sum(reversed(backward), []), flat)
+
+    def test_nulls_sort_first(self):
+        pages = self.walk({"sort": "composer", "sort_artist": "arranger"}, key="next_cursor")
+        pieces = Piece.objects.in_bulk(sum(pages, []))
+        names = [pieces[pk].arranger.name if pieces[pk].arranger else "" for pk in sum(pages, [])]
+        self.assertEqual(names, sorted(names))
+        self.assertEqual(names[0], "")
+
+    def test_page_numbers_and_counts(self):
+        response = self.client.get(reverse("scorelib_index"), {"sort": "title"})
+        page = response.context["page_obj"]
+        self.assertEqual((page.number, page.num_pages, page.count), (1, 3, 120))
+        self.assertFalse(page.has_previous)
+
+        response = self.client.get(reverse("scorelib_index"), {"cursor": page.next_cursor})
+        self.assertEqual(response.context["page_obj"].number, 2)
+        self.assertNotIn("cursor", response.context["active_filters"])
+
+        response = self.client.get(reverse("scorelib_index"), {"cursor": "last"})
+        page = response.context["page_obj"]
+        self.assertEqual((page.number, len(page.object_list)), (3, 20))
+        self.assertFalse(page.has_next)
+
+    def test_invalid_or_foreign_cursor_starts_over(self):
+        first = self.client.get(reverse("scorelib_index")).context["page_obj"]
+        first_pks = [piece.pk for piece in first.object_list]
+        for params in (
+            {"cursor": first.next_cursor[:-2] + "xx"},
+            {"cursor": "garbage"},
+            {"cursor": first.next_cursor, "sort": "title", "sort_dir": "desc"},
+        ):
+            page = self.client.get(reverse("scorelib_index"), params).context["page_obj"]
+            self.assertEqual(page.number, 1)
+            if "sort" not in params:
+                self.assertEqual([piece.pk for piece in page.object_list], first_pks)
+
+    def test_empty_cursor_page_starts_over(self):
+        params = {"sort": "title"}
+        first = self.client.get(reverse("scorelib_index"), params).context["page_obj"]
+        second = self.client.get(reverse("scorelib_index"), dict(params, cursor=first.next_cursor))
+        # the rows after the anchor are gone
+        Piece.objects.exclude(pk__in=[piece.pk for piece in first.object_list[:30]]).delete()
+        for cursor in (first.next_cursor, second.context["page_obj"].next_cursor):
+            page = self.client.get(reverse("scorelib_index"), dict(params, cursor=cursor))
+            page = page.context["page_obj"]
+            self.assertEqual((page.number, page.num_pages, page.count), (1, 1, 30))
+            self.assertEqual(len(page.object_list), 30)
+
+        # a filter that leaves nothing after the anchor
+        page = self.client.get(
+            reverse("scorelib_index"), dict(params, search="stück 0", cursor=first.next_cursor)
+        ).context["page_obj"]
+        self.assertEqual(page.number, 1)
+        self.assertTrue(page.object_list)
+
+    def test_count_is_cached_until_data_changes(self):
+        ordering = [("title", False), ("pk", False)]
+        with self.assertNumQueries(2):
+            page = keyset_page(Piece.objects.all(), ordering, per_page=50)
+        with self.assertNumQueries(1):
+            keyset_page(Piece.objects.all(), ordering, page.next_cursor, per_page=50)
+
+        Piece.objects.create(title="Neues Stück", composer=Composer.objects.first())
+        with self.assertNumQueries(2):
+            page = keyset_page(Piece.objects.all(), ordering, page.next_cursor, per_page=50)
+        self.assertEqual(page.count, 121)
+
+    def test_concert_list(self):
+        for i in range(55):
+            Concert.objects.create(
+                title=f"Konzert {1950 + i}",
+                date=timezone.now() - timedelta(days=400 * i) if i % 2 else None,
+            )
+        pages = []
+        cursor = None
+        while True:
+            params = {"cursor": cursor} if cursor else {}
+            page = self.client.get(reverse("concert_list"), params).context["page_obj"]
+            pages.append([concert.pk for concert in page.object_list])
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+        self.assertEqual([len(pks) for pks in pages], [50, 5])
+        flat = sum(pages, [])
+        expected = list(Concert.objects.order_by("-sort_date", "title", "pk").values_list("pk", flat=True))
+        self.assertEqual(flat, expected)
+
+
+@skipUnless(connection.vendor == "postgresql", "needs PostgreSQL (POSTGRES_DB=...)")
+@override_settings(SCORELIB_SEARCH_BACKEND="scorelib.search_backends.PostgresSearchBackend")
+class PostgresSearchBackendTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.composer = Composer.objects.create(name="Peter Tschaikowsky")
+        Piece.objects.create(
+            title="Großer Marsch", composer=cls.composer, archive_label="K-2"
+        )
+
+    def search(self, query):
+        return list(search_pieces(Piece.objects.all(), query).values_list("title", flat=True))
+
+    def test_tsvector_prefix_search(self):
+        self.assertEqual(self.search("grosser mar"), ["Großer Marsch"])
+        self.assertEqual(self.search("tschaikowsky gross"), ["Großer Marsch"])
+        self.assertEqual(self.search("walzer"), [])
+
+    def test_trigram_similarity_for_names(self):
+        self.assertEqual(self.search("tschaikowski"), ["Großer Marsch"])
+
+    def test_vector_follows_renames(self):
+        self.composer.name = "Modest Mussorgski"
+        self.composer.save()
+        self.assertEqual(self.search("mussorgski marsch"), ["Großer Marsch"])
+
+    def test_vector_follows_merges(self):
+        duplicate = Composer.objects.create(name="Pjotr Iljitsch")
+        Piece.objects.create(title="Nussknacker", composer=duplicate)
+        self.assertNotIn("Nussknacker", self.search("tschaikowsky nussk"))
+        merge_names(self.composer, [duplicate.pk])
+        self.assertIn("Nussknacker", self.search("tschaikowsky nussk"))
+        self.assertEqual(self.search("pjotr iljitsch"), [])
@@ -25,6 +25,17 @@ urlpatterns = [
     path("next-concert/", views.concert_detail_view, name="next_concert"),
     # API for live search
     path("api/search/", views.scorelib_search, name="scorelib_api_search"),
+    path("api/parts/", views.scorelib_part_search, name="scorelib_api_part_search"),
+    path(
+        "api/typeahead/<str:kind>/",
+        views.scorelib_typeahead,
+        name="scorelib_api_typeahead",
+    ),
+    path(
+        "api/search/cache-stats/",
+        views.scorelib_search_cache_stats,
+        name="scorelib_api_search_cache_stats",
+    ),
     path("concerts/", views.concert_list_view, name="concert_list"),
     path(
         "concerts/<int:concert_id>/", views.concert_detail_view, name="concert_detail"
@@ -34,6 +45,16 @@ urlpatterns = [
         views.export_concert_setlist_gema,
         name="export_concert_gema",
     ),
+    path(
+        "concerts/<int:concert_id>/bundle/",
+        views.concert_bundle_download,
+        name="concert_bundle_download",
+    ),
+    path(
+        "concerts/<int:concert_id>/folder/<int:group_id>/",
+        views.concert_folder_download,
+        name="concert_folder_download",
+    ),
     path("archive/", views.scorelib_index, name="scorelib_index"),
     path("radio/", views.radio_player_view, name="radio_player"),
     # abgesicherter Download
@@ -47,6 +68,17 @@ urlpatterns = [
         views.protected_audio_download,
         name="protected_audio_download",
     ),
+    # signed short-lived links (HMAC check only, no session)
+    path(
+        "download/part/s/<str:token>/",
+        views.signed_part_download,
+        name="signed_part_download",
+    ),
+    path(
+        "download/audio/s/<str:token>/",
+        views.signed_audio_download,
+        name="signed_audio_download",
+    ),
     path("piece/<int:pk>/", views.piece_detail, name="scorelib_piece_detail"),
     path("legal/", views.legal_view, name="legal"),
     path("profile/", views.profile_view, name="profile_view"),
@@ -22,6 +22,7 @@ import os
 import subprocess
 import shutil
 from pypdf import PdfReader, PdfWriter
+from pypdf.errors import PdfReadError
 from django.core.files.base import ContentFile
 from .models import Part, SiteSettings, AudioRecording
 from django.conf import settings
@@ -67,6 +68,26 @@ def add_pdf_metadata(writer, piece, part_name):
     })
 
 
+def add_concert_pdf_metadata(writer, concert, group, pieces):
+    """
+    Counterpart of add_pdf_metadata for a concert folder: the same fields,
+    filled with the concert, the instrument group and the composers of all
+    pieces, so sheet music apps file the folder like a single part.
+    """
+    composers = []
+    for piece in pieces:
+        if piece.composer and piece.composer.name not in composers:
+            composers.append(piece.composer.name)
+
+    writer.add_metadata({
+        "/Title": f"{concert.title} ({group.name})",
+        "/Author": ", ".join(composers),
+        "/Subject": group.name,
+        "/Keywords": ", ".join([concert.title, group.name] + composers),
+        "/Creator": "SKG Notenbank",
+    })
+
+
 def parse_page_ranges(range_string):
     """
     Converts strings like '1, 3-5, 8' into a list of 0-based page indices: [0, 2, 3, 4, 7]
@@ -143,6 +164,41 @@ def process_pdf_split(piece, source_file, valid_data_list):
                 new_part.save()
 
 
+def write_concert_folder_pdf(output, concert, group, program):
+    """
+    Concatenates the parts of a concert program into one PDF ("Notenmappe").
+
+    `program` is a list of (piece, [part, ...]) in program order. Every piece
+    gets a bookmark on its first page, with one child bookmark per part if a
+    piece has several parts for the group. Unreadable files are skipped.
+    """
+    writer = PdfWriter()
+
+    for position, (piece, parts) in enumerate(program, start=1):
+        piece_bookmark = None
+        for part in parts:
+            try:
+                reader = PdfReader(part.pdf_file.path)
+            except (FileNotFoundError, PdfReadError):
+                continue
+
+            first_page = len(writer.pages)
+            for page in reader.pages:
+                writer.add_page(page)
+            if len(writer.pages) == first_page:
+                continue
+
+            if piece_bookmark is None:
+                piece_bookmark = writer.add_outline_item(
+                    f"{position}. {piece.title}", first_page
+                )
+            if len(parts) > 1:
+                writer.add_outline_item(part.part_name, first_page, parent=piece_bookmark)
+
+    add_concert_pdf_metadata(writer, concert, group, [piece for piece, _ in program])
+    writer.write(output)
+
+
 def process_audio_file_logic(recording_obj):
     """
     Centralized logic for processing an uploaded audio file:
@@ -179,11 +235,12 @@ def process_audio_file_logic(recording_obj):
     # case 1: ffmpeg is available and audio ripping is enabled -> convert to MP3 with metadata
     if site_settings and site_settings.audio_ripping_enabled and shutil.which("ffmpeg"):
         new_filename = f"{base_name}.mp3"
-        new_rel_path = os.path.join("concerts/audio", new_filename)
+        new_rel_path = audio_upload_path(new_filename)
         new_full_path = os.path.join(settings.MEDIA_ROOT, new_rel_path)
 
         if old_full_path == new_full_path and ext == ".mp3":
             return  # Bereits korrekt verarbeitet
+        os.makedirs(os.path.dirname(new_full_path), exist_ok=True)
 
         cmd = [
             "ffmpeg",
@@ -225,9 +282,14 @@ def process_audio_file_logic(recording_obj):
         rename_only(recording_obj, old_full_path, base_name, ext)
 
 
+def audio_upload_path(filename):
+    """Relative path for a recording, following the (possibly sharded) upload_to."""
+    return AudioRecording._meta.get_field("audio_file").upload_to.path_for(filename)
+
+
 def rename_only(recording_obj, old_full_path, base_name, ext):
     new_filename = f"{base_name}{ext}"
-    new_rel_path = os.path.join("concerts/audio", new_filename)
+    new_rel_path = audio_upload_path(new_filename)
     new_full_path = os.path.join(settings.MEDIA_ROOT, new_rel_path)
 
     if old_full_path != new_full_path:
@@ -0,0 +1,80 @@
+"""
+SKG Notenbank - Sheet Music Database and Archive Management System
+Copyright (C) 2026 Arno Euteneuer
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from django.db import transaction
+
+from .matching import part_name_matches
+from .models import InstrumentGroup, Part, PartGroupMatch
+
+
+def sync_part_matches(part):
+    """Recompute the PartGroupMatch rows of a single part."""
+    wanted = {
+        group.pk
+        for group in InstrumentGroup.objects.all()
+        if group.matches_part(part.part_name)
+    }
+    existing = set(part.group_matches.values_list("group_id", flat=True))
+
+    with transaction.atomic():
+        if existing - wanted:
+            part.group_matches.filter(group_id__in=existing - wanted).delete()
+        PartGroupMatch.objects.bulk_create(
+            [PartGroupMatch(part=part, group_id=pk) for pk in wanted - existing],
+            ignore_conflicts=True,
+        )
+
+
+def sync_group_matches(group):
+    """
+    Recompute the PartGroupMatch rows of a single group against all parts.
+    Only the difference is written, so saving a group with unchanged
+    filter_strings does not touch the table.
+    """
+    matcher = group.matcher
+    wanted = {
+        pk
+        for pk, part_name in Part.objects.values_list("pk", "part_name")
+        if part_name_matches(matcher, part_name)
+    }
+    existing = set(group.part_matches.values_list("part_id", flat=True))
+
+    with transaction.atomic():
+        if existing - wanted:
+            group.part_matches.filter(part_id__in=existing - wanted).delete()
+        PartGroupMatch.objects.bulk_create(
+            [PartGroupMatch(part_id=pk, group=group) for pk in wanted - existing],
+            batch_size=500,
+            ignore_conflicts=True,
+        )
+
+
+def rebuild_all_matches():
+    """Throw away and rebuild the complete match table. Returns the row count."""
+    groups = [(group.pk, group.matcher) for group in InstrumentGroup.objects.all()]
+    matches = [
+        PartGroupMatch(part_id=part_pk, group_id=group_pk)
+        for part_pk, part_name in Part.objects.values_list("pk", "part_name")
+        for group_pk, matcher in groups
+        if part_name_matches(matcher, part_name)
+    ]
+
+    with transaction.atomic():
+        PartGroupMatch.objects.all().delete()
+        PartGroupMatch.objects.bulk_create(matches, batch_size=500)
+    return len(matches)
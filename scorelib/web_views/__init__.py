@@ -27,18 +27,35 @@ from .workflows import (
     process_single_audio,
     suggest_merges_page,
 )
-from .archive import index, piece_detail, scorelib_index, scorelib_search
+from .archive import (
+    index,
+    piece_detail,
+    scorelib_index,
+    scorelib_part_search,
+    scorelib_search,
+    scorelib_search_cache_stats,
+    scorelib_typeahead,
+)
 from .concerts import (
+    concert_bundle_download,
     concert_detail_view,
+    concert_folder_download,
     concert_list_view,
     export_concert_setlist_gema,
 )
-from .downloads import protected_audio_download, protected_part_download
+from .downloads import (
+    protected_audio_download,
+    protected_part_download,
+    signed_audio_download,
+    signed_part_download,
+)
 from .radio_player import radio_player_view
 
 __all__ = [
     "audio_ripping_page",
+    "concert_bundle_download",
     "concert_detail_view",
+    "concert_folder_download",
     "concert_list_view",
     "delete_audio_recording",
     "export_concert_setlist_gema",
@@ -55,6 +72,11 @@ __all__ = [
     "protected_part_download",
     "radio_player_view",
     "scorelib_index",
+    "scorelib_part_search",
     "scorelib_search",
+    "scorelib_search_cache_stats",
+    "scorelib_typeahead",
+    "signed_audio_download",
+    "signed_part_download",
     "suggest_merges_page",
 ]
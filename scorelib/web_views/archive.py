@@ -19,13 +19,45 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 import os
 
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
-from django.db.models import Q
-from django.http import JsonResponse
+from django.db.models import Count, Prefetch, Q
+from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404, render
-from django.urls import reverse
+from django.utils import timezone
 
-from ..models import Arranger, Composer, Concert, Genre, Piece, Publisher
+from ..models import Arranger, Composer, Concert, Genre, Part, Piece, Publisher
+from ..matching import normalize_search_text
+from ..pagination import keyset_page, without_cursor
+from ..part_search import search_parts
+from ..search_backends import rank_pieces, search_pieces
+from ..search_index import prefix_filter
+from ..search_cache import cached_search, get_search_cache
+from ..signed_urls import download_url_for
+
+
+# typeahead kind -> (model, name of its relation to Piece, order of the options)
+TYPEAHEAD_MODELS = {
+    "composer": (Composer, "pieces", "-piece_count"),
+    "arranger": (Arranger, "pieces", "-piece_count"),
+    "publisher": (Publisher, "pieces", "-piece_count"),
+    "genre": (Genre, "piece", "-piece_count"),
+    # newest concerts first, as in the concert list
+    "concert": (Concert, "program", "-sort_date"),
+}
+TYPEAHEAD_LIMIT = 20
+
+
+def _selected(model, pk):
+    """The object chosen in a lazily loaded filter dropdown, if any."""
+    if not pk or not pk.isdigit():
+        return None
+    return model.objects.filter(pk=pk).first()
+
+
+def typeahead_label(obj):
+    """The text of a typeahead option; concerts show their year."""
+    if isinstance(obj, Concert):
+        return f"{obj.title} ({obj.date:%Y})" if obj.date else obj.title
+    return obj.name
 
 
 @login_required
@@ -43,18 +75,13 @@ def scorelib_index(request):
     f_arr = request.GET.get("arranger")
     f_pub = request.GET.get("publisher")
     f_con = request.GET.get("concert")
-    f_sort = request.GET.get("sort", "title")
+    # searches are ordered by relevance unless a column was chosen
+    f_sort = request.GET.get("sort") or ("relevance" if f_search else "title")
     f_sort_dir = request.GET.get("sort_dir", "asc")
     f_sort_artist = request.GET.get("sort_artist", "composer")
 
     if f_search:
-        pieces = pieces.filter(
-            Q(title__icontains=f_search)
-            | Q(archive_label__icontains=f_search)
-            | Q(composer__name__icontains=f_search)
-            | Q(arranger__name__icontains=f_search)
-            | Q(additional_info__icontains=f_search)
-        )
+        pieces = search_pieces(pieces, f_search)
     if f_genre:
         pieces = pieces.filter(genres__id=f_genre)
     if f_diff:
@@ -70,9 +97,9 @@ def scorelib_index(request):
 
     pieces = pieces.distinct()
 
-    f_sort_artist = request.GET.get("sort_artist", "composer")
-
-    if f_sort == "title":
+    if f_sort == "relevance":
+        order_field = None
+    elif f_sort == "title":
         order_field = "title"
     elif f_sort == "composer":
         order_field = (
@@ -87,86 +114,226 @@ def scorelib_index(request):
     else:
         order_field = "title"
 
-    if f_sort_dir == "desc":
-        order_field = f"-{order_field}"
-
-    pieces = pieces.order_by(order_field)
-
-    paginator = Paginator(pieces, 50)
-    page_number = request.GET.get("page", 1)
-    try:
-        page_obj = paginator.page(page_number)
-    except Exception:
-        page_obj = paginator.page(1)
+    # the ordering must end in a unique column for keyset pagination
+    if order_field is not None:
+        descending = f_sort_dir == "desc"
+        ordering = [(order_field, descending), ("pk", descending)]
+        if order_field != "title":
+            ordering.insert(1, ("title", False))
+    else:
+        pieces = rank_pieces(pieces, f_search)
+        annotations = pieces.query.annotations
+        ordering = [("fuzzy_rank", False)] if "fuzzy_rank" in annotations else []
+        if "search_rank" in annotations:
+            ordering.append(("search_rank", True))
+        ordering += [("title", False), ("pk", False)]
+
+    page_obj = keyset_page(
+        pieces,
+        ordering,
+        request.GET.get("cursor"),
+        per_page=50,
+        signature=f"{f_sort}:{f_sort_dir}:{f_sort_artist}",
+    )
 
     context = {
         "pieces": page_obj.object_list,
         "page_obj": page_obj,
-        "genres": Genre.objects.all().order_by("name"),
-        "composers": Composer.objects.all().order_by("name"),
-        "arrangers": Arranger.objects.all().order_by("name"),
-        "publishers": Publisher.objects.all().order_by("name"),
-        "concerts": Concert.objects.all().order_by("-date"),
-        "active_filters": request.GET,
+        # the other options of these dropdowns are loaded via scorelib_typeahead
+        "selected_genre": _selected(Genre, f_genre),
+        "selected_composer": _selected(Composer, f_comp),
+        "selected_arranger": _selected(Arranger, f_arr),
+        "selected_publisher": _selected(Publisher, f_pub),
+        "selected_concert": _selected(Concert, f_con),
+        "active_filters": without_cursor(request.GET),
         "current_sort": f_sort,
         "current_sort_dir": f_sort_dir,
         "current_sort_artist": f_sort_artist,
-        "total_count": paginator.count,
+        "total_count": page_obj.count,
     }
     return render(request, "scorelib/index.html", context)
 
 
-@login_required
-def scorelib_search(request):
-    query = request.GET.get("q", "")
-    user_profile = getattr(request.user, "profile", None)
-    has_full_archive_access = request.user.is_staff or (
-        user_profile and user_profile.has_full_archive_access
-    )
-
+def _search_results(query, access):
+    """
+    Live search results without the per-user download links (cacheable).
+    Runs a fixed number of queries however many pieces and parts match:
+    the pieces with their composers, one for the parts and, for
+    musicians, the groups loaded once by the AccessContext. The download
+    window is the denormalized Piece.download_open_until column.
+    """
     pieces = (
-        Piece.objects.filter(
-            Q(title__icontains=query)
-            | Q(additional_info__icontains=query)
-            | Q(composer__name__icontains=query)
-            | Q(arranger__name__icontains=query)
-            | Q(archive_label__icontains=query)
-        )
-        .distinct()
-        .prefetch_related("parts")[:20]
+        rank_pieces(search_pieces(Piece.objects.all(), query), query)
+        .select_related("composer")
+        .only("id", "title", "archive_label", "download_open_until", "composer__name")
     )
+    part_fields = ("id", "piece_id", "part_name", "pdf_file")
+    if access.has_full_access:
+        pieces = pieces.prefetch_related(
+            Prefetch("parts", queryset=Part.objects.only(*part_fields))
+        )
+    elif access.group_ids:
+        pieces = pieces.prefetch_related(
+            Prefetch(
+                "parts",
+                queryset=Part.objects.visible_to(access.group_ids)
+                .filter(piece__download_open_until__gte=timezone.localdate())
+                .only(*part_fields),
+                to_attr="visible_parts",
+            )
+        )
+    pieces = pieces[:20]
 
     results = []
     for piece in pieces:
-        if has_full_archive_access:
+        if access.has_full_access:
             allowed_parts = piece.parts.all()
-        elif user_profile and piece.is_active_for_download():
-            allowed_parts = [
-                p for p in piece.parts.all() if user_profile.can_view_part(p.part_name)
-            ]
+        elif access.group_ids and access.is_piece_downloadable(piece):
+            allowed_parts = piece.visible_parts
         else:
             allowed_parts = []
 
-        parts = [
-            {
-                "id": part.id,
-                "name": part.part_name,
-                "url": reverse("protected_part_download", args=[part.id]),
-            }
-            for part in allowed_parts
-        ]
-
         results.append(
             {
                 "id": piece.id,
                 "title": piece.title,
                 "composer": piece.composer.name if piece.composer else "",
                 "label": piece.archive_label,
-                "parts": parts,
+                "parts": [
+                    (part.id, part.part_name, part.pdf_file.name)
+                    for part in allowed_parts
+                ],
             }
         )
+    return results
+
+
+@login_required
+def scorelib_search(request):
+    query = request.GET.get("q", "")
+    access = request.access
+
+    results = cached_search(query, access, lambda: _search_results(query, access))
+    return JsonResponse(
+        {
+            "results": [
+                {
+                    **piece,
+                    "parts": [
+                        {
+                            "id": part_id,
+                            "name": name,
+                            "url": download_url_for("part", part_id, file_name, request.user),
+                        }
+                        for part_id, name, file_name in piece["parts"]
+                    ],
+                }
+                for piece in results
+            ]
+        }
+    )
+
+
+@login_required
+def scorelib_typeahead(request, kind):
+    """
+    Names of `kind` starting with `q` (normalized, via the indexed
+    search_key), most used (concerts: newest) first, with their piece counts.
+    """
+    if kind not in TYPEAHEAD_MODELS:
+        raise Http404
+    model, relation, order = TYPEAHEAD_MODELS[kind]
+    try:
+        limit = min(int(request.GET.get("limit", TYPEAHEAD_LIMIT)), 50)
+    except ValueError:
+        limit = TYPEAHEAD_LIMIT
+
+    limit = max(limit, 1)
+    query = request.GET.get("q", "")
+
+    def matches(condition):
+        return list(
+            model.objects.filter(condition)
+            .annotate(piece_count=Count(relation))
+            .order_by(order, "search_key")[:limit]
+        )
 
-    return JsonResponse({"results": results})
+    rows = matches(prefix_filter(query))
+    key = normalize_search_text(query)
+    if key and len(rows) < limit:
+        # then later words ("dvo" -> "Antonín Dvořák"); names tables are small
+        rows += [
+            obj
+            for obj in matches(Q(search_key__contains=" " + key))
+            if obj not in rows
+        ][: limit - len(rows)]
+
+    return JsonResponse(
+        {
+            "results": [
+                {"id": obj.id, "name": typeahead_label(obj), "count": obj.piece_count}
+                for obj in rows
+            ]
+        }
+    )
+
+
+@login_required
+def scorelib_part_search(request):
+    """
+    Parts across the whole archive whose name matches the wildcard patterns
+    in `q` (as in the instrument group filters), grouped by piece and
+    paginated by piece.
+    """
+    if not request.access.has_full_access:
+        return JsonResponse(
+            {"status": "error", "message": "Zugriff verweigert."}, status=403
+        )
+
+    query = request.GET.get("q", "")
+    page_obj = search_parts(query, request.GET.get("page"))
+
+    return JsonResponse(
+        {
+            "count": page_obj.count,
+            "page": page_obj.number,
+            "num_pages": page_obj.num_pages,
+            "results": [
+                {
+                    "piece": {
+                        "id": piece.id,
+                        "title": piece.title,
+                        "composer": piece.composer.name,
+                        "label": piece.archive_label,
+                    },
+                    "parts": [
+                        {
+                            "id": part.id,
+                            "name": part.part_name,
+                            "url": download_url_for(
+                                "part", part.id, part.pdf_file.name, request.user
+                            ),
+                        }
+                        for part in parts
+                    ],
+                }
+                for piece, parts in page_obj.results
+            ],
+        }
+    )
+
+
+@login_required
+def scorelib_search_cache_stats(request):
+    """Hit/eviction counters of this worker's live search cache (staff only)."""
+    if not request.user.is_staff:
+        return JsonResponse(
+            {"status": "error", "message": "Zugriff verweigert."}, status=403
+        )
+    cache = get_search_cache()
+    return JsonResponse(
+        {"pid": os.getpid(), "enabled": cache is not None, **(cache.stats() if cache else {})}
+    )
 
 
 def index(request):
@@ -205,11 +372,11 @@ def index(request):
 
     context = {
         "pieces": pieces,
-        "genres": Genre.objects.all().order_by("name"),
-        "composers": Composer.objects.all().order_by("name"),
-        "arrangers": Arranger.objects.all().order_by("name"),
-        "publishers": Publisher.objects.all().order_by("name"),
-        "concerts": Concert.objects.all().order_by("-date"),
+        "selected_genre": _selected(Genre, f_genre),
+        "selected_composer": _selected(Composer, f_comp),
+        "selected_arranger": _selected(Arranger, f_arr),
+        "selected_publisher": _selected(Publisher, f_pub),
+        "selected_concert": _selected(Concert, f_con),
         "active_filters": request.GET,
     }
     return render(request, "scorelib/index.html", context)
@@ -218,24 +385,11 @@ def index(request):
 @login_required
 def piece_detail(request, pk):
     piece = get_object_or_404(Piece, pk=pk)
-    user_profile = getattr(request.user, "profile", None)
 
     all_parts = list(piece.parts.all())
     all_parts.sort(key=lambda x: x.part_name.lower())
 
-    user_parts = []
-
-    if request.user.is_staff or (user_profile and user_profile.has_full_archive_access):
-        user_parts = all_parts
-    elif (
-        user_profile
-        and user_profile.instrument_groups.exists()
-        and piece.is_active_for_download()
-    ):
-        user_parts = [
-            part for part in all_parts if user_profile.can_view_part(part.part_name)
-        ]
-        user_parts.sort(key=lambda x: x.part_name.lower())
+    user_parts = request.access.allowed_parts(piece, all_parts)
 
     return render(
         request,
@@ -28,7 +28,10 @@ from django.shortcuts import get_object_or_404, render
 from django.utils import timezone
 from django.utils.text import slugify
 
-from ..models import Concert
+from ..bundles import get_concert_bundle, get_concert_folder_pdf
+from ..file_serving import serve_protected_file
+from ..models import Concert, InstrumentGroup, Part, Piece
+from ..pagination import keyset_page, without_cursor
 
 
 @login_required
@@ -74,21 +77,29 @@ def concert_detail_view(request, concert_id=None):
 
     context["formatted_duration"] = formatted_duration
 
-    profile = getattr(request.user, "profile", None)
-    context["has_full_archive_access"] = request.user.is_staff or (
-        profile.has_full_archive_access if profile else False
-    )
+    access = request.access
+    context["has_full_archive_access"] = access.has_full_access
+
+    program_items = list(next_concert.programitem_set.all())
+    pieces = Piece.objects.in_bulk({item.piece_id for item in program_items})
+
+    # all parts of the program this musician may see, in a single join
+    visible_parts = {}
+    if access.group_ids:
+        for part in Part.objects.visible_to(access.group_ids).filter(
+            piece__programitem__concert=next_concert
+        ):
+            visible_parts.setdefault(part.piece_id, []).append(part)
 
     program_data = []
-    for item in next_concert.programitem_set.all().select_related("piece"):
-        piece = item.piece
+    for item in program_items:
+        piece = pieces[item.piece_id]
 
         user_parts = []
-        if profile and (
-            profile.has_full_archive_access or piece.is_active_for_download()
+        if access.has_profile and (
+            access.has_full_archive_access or access.is_piece_downloadable(piece)
         ):
-            all_parts = piece.parts.all()
-            user_parts = [p for p in all_parts if profile.can_view_part(p.part_name)]
+            user_parts = visible_parts.get(piece.pk, [])
 
         has_youtube = piece.external_links.filter(
             Q(url__icontains="youtube.com") | Q(url__icontains="youtu.be")
@@ -104,16 +115,60 @@ def concert_detail_view(request, concert_id=None):
         )
 
     context["program_data"] = program_data
-    context["user_profile"] = profile
+    context["has_user_parts"] = any(item["user_parts"] for item in program_data)
+    if context["has_user_parts"]:
+        context["folder_groups"] = InstrumentGroup.objects.filter(
+            pk__in=access.group_ids
+        ).order_by("name")
     context["has_recordings"] = any(item["recordings"] for item in program_data)
 
     return render(request, "scorelib/concert_detail.html", context)
 
 
 @login_required
-def concert_list_view(request):
-    from django.core.paginator import Paginator
+def concert_bundle_download(request, concert_id):
+    concert = get_object_or_404(Concert, pk=concert_id)
+
+    bundle_path = get_concert_bundle(concert, request.access)
+    if bundle_path is None:
+        return HttpResponse(
+            "Zugriff verweigert: Für dieses Konzert stehen dir keine Noten zur Verfügung.",
+            status=403,
+        )
+
+    filename = f"noten_{slugify(concert.title)}-{concert.id}.zip"
+    return serve_protected_file(
+        request, bundle_path, "application/zip", filename=filename, attachment=True
+    )
+
+
+@login_required
+def concert_folder_download(request, concert_id, group_id):
+    concert = get_object_or_404(Concert, pk=concert_id)
+    group = get_object_or_404(InstrumentGroup, pk=group_id)
+
+    access = request.access
+    if not access.has_full_access and group.pk not in access.group_ids:
+        return HttpResponse(
+            "Zugriff verweigert: Diese Instrumentengruppe gehört nicht zu deinem Profil.",
+            status=403,
+        )
+
+    pdf_path = get_concert_folder_pdf(
+        concert, group, include_closed=access.has_full_access
+    )
+    if pdf_path is None:
+        return HttpResponse(
+            "Zugriff verweigert: Für dieses Konzert stehen dir keine Noten zur Verfügung.",
+            status=403,
+        )
+
+    filename = f"notenmappe_{slugify(concert.title)}_{slugify(group.name)}.pdf"
+    return serve_protected_file(request, pdf_path, "application/pdf", filename=filename)
 
+
+@login_required
+def concert_list_view(request):
     f_search = request.GET.get("search", "")
     f_sort = request.GET.get("sort", "date")
     f_sort_dir = request.GET.get("sort_dir", "desc")
@@ -125,31 +180,27 @@ def concert_list_view(request):
             Q(title__icontains=f_search) | Q(subtitle__icontains=f_search)
         )
 
+    descending = f_sort_dir != "asc"
     if f_sort == "date":
-        if f_sort_dir == "asc":
-            concerts = concerts.order_by("sort_date", "title")
-        else:
-            concerts = concerts.order_by("-sort_date", "title")
+        ordering = [("sort_date", descending), ("title", False), ("pk", False)]
     else:
-        if f_sort_dir == "asc":
-            concerts = concerts.order_by("title")
-        else:
-            concerts = concerts.order_by("-title")
-
-    paginator = Paginator(concerts, 50)
-    page_number = request.GET.get("page", 1)
-    try:
-        page_obj = paginator.page(page_number)
-    except Exception:
-        page_obj = paginator.page(1)
+        ordering = [("title", descending), ("pk", descending)]
+
+    page_obj = keyset_page(
+        concerts,
+        ordering,
+        request.GET.get("cursor"),
+        per_page=50,
+        signature=f"{f_sort}:{f_sort_dir}",
+    )
 
     context = {
         "concerts": page_obj.object_list,
         "page_obj": page_obj,
-        "active_filters": request.GET,
+        "active_filters": without_cursor(request.GET),
         "current_sort": f_sort,
         "current_sort_dir": f_sort_dir,
-        "total_count": paginator.count,
+        "total_count": page_obj.count,
     }
     return render(request, "scorelib/concert_list.html", context)
 
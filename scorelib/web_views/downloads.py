@@ -16,60 +16,88 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
+import logging
 import os
 
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.http import FileResponse, Http404, HttpResponse
-from django.shortcuts import get_object_or_404
+from django.core import signing
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import Http404, HttpResponse
+from django.shortcuts import get_object_or_404, redirect
+from django.utils._os import safe_join
 
+from ..file_serving import serve_protected_file
 from ..models import AudioRecording, Part
+from ..signed_urls import KINDS, read_download_token
+
+logger = logging.getLogger("scorelib.downloads")
 
 
 @login_required
 def protected_part_download(request, part_id):
-    part = get_object_or_404(Part, pk=part_id)
+    part = get_object_or_404(Part.objects.select_related("piece"), pk=part_id)
 
-    if not request.user.is_staff:
-        profile = getattr(request.user, "profile", None)
-        piece = part.piece
-        if not profile:
+    access = request.access
+    if not access.is_staff:
+        if not access.has_profile:
             return HttpResponse(
                 "Zugriff verweigert: Du hast keinen Zugriff auf Noten.", status=403
             )
 
-        if not profile.has_full_archive_access:
-            if not piece.is_active_for_download():
+        if not access.has_full_archive_access:
+            if not access.is_piece_downloadable(part.piece):
                 return HttpResponse(
                     "Zugriff verweigert: Noten für dieses Stück stehen momentan nicht zur Verfügung.",
                     status=403,
                 )
 
-            if not profile.can_view_part(part.part_name):
+            if not access.can_view_part(part.part_name):
                 return HttpResponse(
                     "Zugriff verweigert: Diese Stimme gehört nicht zu deinem Instrumenten-Filter.",
                     status=403,
                 )
 
-    file_path = part.pdf_file.path
-    if os.path.exists(file_path):
-        response = FileResponse(open(file_path, "rb"), content_type="application/pdf")
-        response["Content-Disposition"] = (
-            f'inline; filename="{os.path.basename(file_path)}"'
-        )
-        return response
-    raise Http404
+    return serve_protected_file(
+        request, part.pdf_file.path, "application/pdf", etag=part.sha256 or None
+    )
 
 
 @login_required
 def protected_audio_download(request, audio_id):
     recording = get_object_or_404(AudioRecording, pk=audio_id)
-    file_path = recording.audio_file.path
-
-    if not os.path.exists(file_path):
+    return serve_protected_file(request, recording.audio_file.path, "audio/mpeg")
+
+
+def _signed_download(request, kind, token, content_type):
+    # No login_required and no database access: the token was issued by a page
+    # that already checked the permissions, and the HMAC proves it.
+    try:
+        payload = read_download_token(kind, token)
+    except signing.SignatureExpired:
+        # old tab or bookmark: fall back to the session-checked download
+        payload = read_download_token(kind, token, check_age=False)
+        return redirect(KINDS[kind][0], payload["id"])
+    except signing.BadSignature:
+        return HttpResponse("Zugriff verweigert: Ungültiger Download-Link.", status=403)
+
+    try:
+        file_path = safe_join(settings.MEDIA_ROOT, payload["f"])
+    except SuspiciousFileOperation:
         raise Http404
-
-    response = FileResponse(open(file_path, "rb"), content_type="audio/mpeg")
-    response["Content-Disposition"] = (
-        f'inline; filename="{os.path.basename(file_path)}"'
+    if not os.path.exists(file_path):
+        # moved since the link was issued (e.g. by shard_media_files)
+        return redirect(KINDS[kind][0], payload["id"])
+    logger.info(
+        "signed %s download: %s (id %s) for user %s from %s",
+        kind, payload["f"], payload["id"], payload["u"], request.META.get("REMOTE_ADDR"),
     )
-    return response
+    return serve_protected_file(request, file_path, content_type)
+
+
+def signed_part_download(request, token):
+    return _signed_download(request, "part", token, "application/pdf")
+
+
+def signed_audio_download(request, token):
+    return _signed_download(request, "audio", token, "audio/mpeg")
@@ -22,7 +22,7 @@ from django.http import Http404
 from django.shortcuts import redirect, render
 from django.urls import reverse
 
-from ...models import Arranger, Composer, Piece, Publisher
+from ...models import Arranger, Composer, Publisher
 
 
 @login_required
@@ -62,6 +62,8 @@ def suggest_merges_page(request, model_name):
 
 @login_required
 def merge_cluster_confirm(request, model_name):
+    from ...admin import merge_names
+
     model_map = {
         "composer": Composer,
         "arranger": Arranger,
@@ -116,14 +118,7 @@ def merge_cluster_confirm(request, model_name):
             messages.warning(request, "Keine Einträge zum Zusammenführen ausgewählt.")
             return redirect(f"admin:scorelib_{model_name}_changelist")
 
-        if model_name == "composer":
-            Piece.objects.filter(composer_id__in=merge_ids).update(composer=master)
-        elif model_name == "arranger":
-            Piece.objects.filter(arranger_id__in=merge_ids).update(arranger=master)
-        elif model_name == "publisher":
-            Piece.objects.filter(publisher_id__in=merge_ids).update(publisher=master)
-
-        Model.objects.filter(id__in=merge_ids).delete()
+        merge_names(master, merge_ids)
 
         count = len(merge_ids)
         messages.success(
@@ -15,7 +15,8 @@ BACKUP_NAME="full_backup_$TIMESTAMP.tar.gz"
 mkdir -p "$BACKUP_DIR"
 
 # 1. Fingerabdruck berechnen (DB und Media-Dateien)
-CURRENT_STATE=$(find "$MEDIA_DIR" "$DB_FILE" -type f -printf '%T@ %s %p\n' | md5sum)
+# (media/cache enthält nur neu erzeugbare Konzert-Bundles und wird ignoriert)
+CURRENT_STATE=$(find "$MEDIA_DIR" "$DB_FILE" -path "$MEDIA_DIR/cache" -prune -o -type f -printf '%T@ %s %p\n' | md5sum)
 
 # 2. Prüfen, ob sich etwas geändert hat
 if [ -f "$STATE_FILE" ]; then
@@ -31,7 +32,7 @@ TEMP_DB="/tmp/temp_db.sqlite3"
 sqlite3 "$DB_FILE" ".backup '$TEMP_DB'"
 
 # Archiv erstellen (enthält media/ und die Datenbank)
-tar -czf "$BACKUP_DIR/$BACKUP_NAME" -C "$PROJECT_DIR" media -C "/tmp" temp_db.sqlite3
+tar -czf "$BACKUP_DIR/$BACKUP_NAME" --exclude=media/cache -C "$PROJECT_DIR" media -C "/tmp" temp_db.sqlite3
 rm "$TEMP_DB"
 
 # 4. Rotation: Behalte nur die letzten 10
@@ -73,6 +73,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "scorelib.middleware.AccessContextMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -107,6 +108,17 @@ DATABASES = {
         "NAME": BASE_DIR / "db.sqlite3",
     }
 }
+# PostgreSQL, e.g. for running the tests of the PostgreSQL search backend:
+# POSTGRES_DB=skg python manage.py test scorelib
+if os.environ.get("POSTGRES_DB"):
+    DATABASES["default"] = {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": os.environ["POSTGRES_DB"],
+        "USER": os.environ.get("POSTGRES_USER", ""),
+        "PASSWORD": os.environ.get("POSTGRES_PASSWORD", ""),
+        "HOST": os.environ.get("POSTGRES_HOST", ""),
+        "PORT": os.environ.get("POSTGRES_PORT", ""),
+    }
 
 
 # 5. AUTHENTICATION & LOGIN REDIRECTS
@@ -150,3 +162,77 @@ MEDIA_ROOT = BASE_DIR / "media"
 
 # 8. DEFAULT PRIMARY KEY FIELD
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+
+# 9. SCORELIB
+# Parts stay downloadable for regular musicians until this many days after
+# the last concert the piece was played in. The resulting date is stored on
+# each piece; run `manage.py rebuild_download_windows` after changing this.
+SCORELIB_DOWNLOAD_GRACE_DAYS = 14
+
+# Pages listing parts/recordings hand out HMAC-signed links that are served
+# without session or database lookups. They expire after this many seconds;
+# an expired link redirects to the regular permission-checked download.
+# Links stay the same for SCORELIB_SIGNED_URL_BUCKET seconds so that browsers
+# can reuse (revalidate) their cached downloads.
+SCORELIB_SIGNED_DOWNLOADS = True
+SCORELIB_SIGNED_URL_MAX_AGE = 2 * 60 * 60
+SCORELIB_SIGNED_URL_BUCKET = 60 * 60
+
+# Signed links are not bound to a session: anyone holding one can use it
+# until it expires. Each signed download is logged with the user the link
+# was issued to, so that a shared link can be traced.
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {"timestamped": {"format": "{asctime} {name} {message}", "style": "{"}},
+    "handlers": {"console": {"class": "logging.StreamHandler", "formatter": "timestamped"}},
+    "loggers": {
+        "scorelib.downloads": {
+            "handlers": ["console"],
+            "level": os.environ.get("SCORELIB_DOWNLOAD_LOG_LEVEL", "INFO"),
+        },
+    },
+}
+
+# Let nginx stream protected files: Django only checks the permissions and
+# answers with an X-Accel-Redirect to an `internal` location that aliases
+# MEDIA_ROOT (see deploy/etc_nginx_sites-available_skg-notenbank).
+# Leave disabled when running without nginx (e.g. runserver).
+SCORELIB_X_ACCEL_REDIRECT = os.environ.get("SCORELIB_X_ACCEL_REDIRECT") == "1"
+SCORELIB_X_ACCEL_PREFIX = "/protected-media/"
+
+# Pre-built artifacts (concert ZIP bundles and PDF folders), keyed by their content and thus
+# safe to delete at any time. Kept below MEDIA_ROOT so they can be offloaded
+# to nginx as well; excluded from backups and from the public /media/ alias.
+# None means MEDIA_ROOT / "cache", resolved when used (so it follows
+# MEDIA_ROOT overrides, e.g. in tests).
+SCORELIB_CACHE_DIR = None
+
+# Store part PDFs content-addressed: identical files share one blob in
+# media/blobs/ and the regular file names are hard links to it. Convert an
+# existing tree with `manage.py dedup_part_files` (which also removes blobs
+# nobody references any more; run it regularly, e.g. from cron).
+SCORELIB_DEDUP_STORAGE = os.environ.get("SCORELIB_DEDUP_STORAGE") == "1"
+
+# Put new part PDFs and recordings into two levels of hash-prefix
+# directories (sheet_music/parts/3f/a2/...) instead of one flat folder.
+# Move the existing files with `manage.py shard_media_files`.
+SCORELIB_SHARDED_UPLOADS = os.environ.get("SCORELIB_SHARDED_UPLOADS") == "1"
+
+# Search over titles, labels and names (index page, live search, admin).
+# DatabaseSearchBackend uses an SQLite FTS5 table (plain ORM query elsewhere);
+# PostgresSearchBackend a tsvector column with GIN index plus pg_trgm
+# similarity for names. Run `manage.py rebuild_search_index` after switching.
+SCORELIB_SEARCH_BACKEND = os.environ.get(
+    "SCORELIB_SEARCH_BACKEND", "scorelib.search_backends.DatabaseSearchBackend"
+)
+
+# When a search finds fewer pieces than this, similar titles and names from
+# the trigram index are added ("Tchaikowsky" -> "Tschaikowsky"); 0 disables.
+# Rebuild the index with `manage.py rebuild_piece_trigrams`.
+SCORELIB_FUZZY_MIN_RESULTS = 3
+
+# Live search results kept per worker process (LRU, per query and access
+# scope; 0 disables). Hit rate and evictions: /api/search/cache-stats/.
+SCORELIB_SEARCH_CACHE_SIZE = 500